@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import ssl, time, asyncio, collections
+import urllib.parse
+
+from acrcloud.recognizer import (ACRCloudRecognizer, ACRCloudMultipartEncoder, ACRCloudStatusCode, ACRCloudDeadline,
+                                 ACRCloudDeadlineExceeded, ACRCloudPCMRingBuffer, ACRCloudProxyRules,
+                                 ACRCloudPoolExhausted, ACRCloudHedgePolicy)
+
+'''
+asyncio client for ACRCloud.
+
+AsyncACRCloudRecognizer mirrors every recognize_* method of ACRCloudRecognizer as a
+coroutine (recognize_stream as an async generator). Fingerprints are created by
+acrcloud_extr_tool in an executor, requests are signed and encoded by the same code as
+ACRCloudRecognizer, and identify calls go through a non-blocking keep-alive connection
+pool.
+
+Example:
+    async def main():
+        re = AsyncACRCloudRecognizer(config)
+        results = await asyncio.gather(*[re.recognize_by_file(f, 0) for f in files])
+        await re.close()
+
+    asyncio.run(main())
+'''
+
+
+async def _iterate(chunks):
+    if hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+class ACRCloudAsyncConnectionPool:
+    '''
+    asyncio counterpart of ACRCloudConnectionPool: persistent HTTP/1.1 connections per
+    (scheme, host, port), at most max_per_host open at once, idle ones closed after
+    idle_timeout seconds, and one retry when a reused connection was closed by the server.
+    Like it, the pool connects directly: proxied(url) tells whether a proxy applies.
+    '''
+
+    RETRYABLE_ERRORS = (ConnectionResetError, ConnectionAbortedError, BrokenPipeError,
+                        asyncio.IncompleteReadError, ssl.SSLError)
+
+    def __init__(self, max_per_host=4, idle_timeout=30, ssl_context=None):
+        self.max_per_host = max(1, int(max_per_host))
+        self.idle_timeout = idle_timeout
+        self._proxy_rules = ACRCloudProxyRules()
+        self.ssl_context = ssl_context
+        self._idle = {}  # key -> deque of (reader, writer, last_used)
+        self._slots = {}  # key -> asyncio.Semaphore bounding open connections
+
+    def proxied(self, url):
+        return self._proxy_rules.applies(url)
+
+    async def request(self, method, url, body=None, headers=None, timeout=5):
+        '''ACRCloudPoolExhausted if no connection to the host comes free within timeout.'''
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = asyncio.Semaphore(self.max_per_host)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(slot.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise ACRCloudPoolExhausted('connection pool exhausted for %s' % parts.hostname)
+        try:
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+            return await asyncio.wait_for(self._request(key, parts, method, body, headers or {}), remaining)
+        finally:
+            slot.release()
+
+    async def close(self):
+        for idle in self._idle.values():
+            while idle:
+                _, writer, _ = idle.pop()
+                writer.close()
+
+    async def _request(self, key, parts, method, body, headers):
+        path = parts.path or '/'
+        if parts.query:
+            path = path + '?' + parts.query
+
+        head = ['%s %s HTTP/1.1' % (method, path), 'Host: %s' % parts.netloc]
+        for k, v in headers.items():
+            head.append('%s: %s' % (k, v))
+        head = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+        for attempt in range(2):
+            reader, writer, reused = await self._acquire(key)
+            try:
+                writer.write(head)
+                if body is not None:
+                    for segment in body:
+                        writer.write(segment)
+                await writer.drain()
+                status, reason, data, reusable = await self._read_response(reader)
+            except self.RETRYABLE_ERRORS:
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if reusable:
+                self._idle.setdefault(key, collections.deque()).append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+            return status, reason, data
+
+    async def _acquire(self, key):
+        now = time.monotonic()
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer, last_used = idle.pop()
+            if now - last_used > self.idle_timeout or reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            return reader, writer, True
+
+        scheme, host, port = key
+        if scheme == 'https':
+            context = self.ssl_context or ssl.create_default_context()
+            reader, writer = await asyncio.open_connection(host, port or 443, ssl=context)
+        else:
+            reader, writer = await asyncio.open_connection(host, port or 80)
+        return reader, writer, False
+
+    @staticmethod
+    async def _read_response(reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError('connection closed before response')
+        version, status, reason = (line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            k, _, v = line.decode('latin-1').partition(':')
+            headers[k.strip().lower()] = v.strip()
+
+        reusable = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            data = await reader.read()
+            reusable = False
+        return status, reason, data, reusable
+
+
+class AsyncACRCloudRecognizer:
+    def __init__(self, config, executor=None):
+        # signing, multipart encoding and fingerprint options come from the blocking
+        # recognizer so both clients send byte-identical requests.
+        self.recognizer = ACRCloudRecognizer(dict(config, keep_alive=False, hedge=False, hedge_policy=None))
+        # the blocking recognizer can not hedge without its pool; this client hedges on its own connections.
+        self.recognizer.hedge_policy = ACRCloudHedgePolicy.from_config(config)
+        self.host = self.recognizer.host
+        self.query_type = self.recognizer.query_type
+        self.access_key = self.recognizer.access_key
+        self.access_secret = self.recognizer.access_secret
+        self.timeout = self.recognizer.timeout
+        self.executor = executor
+
+        self.pool = config.get('async_connection_pool')
+        self._own_pool = False
+        if self.pool is None:
+            self.pool = ACRCloudAsyncConnectionPool(config.get('pool_max_per_host', 4),
+                                                    config.get('pool_idle_timeout', 30),
+                                                    config.get('ssl_context'))
+            self._own_pool = True
+        self.semaphore = asyncio.Semaphore(config.get('max_concurrency', 64))
+
+    async def close(self):
+        if self._own_pool:
+            await self.pool.close()
+        self.recognizer.close()
+
+    async def post_multipart(self, url, fields, files, timeout):
+        try:
+            return (await self.post_multipart_attempt(url, fields, files, timeout))[0]
+        except ACRCloudPoolExhausted as e:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e))
+
+    async def post_multipart_attempt(self, url, fields, files, timeout):
+        if self.pool.proxied(url):
+            # urllib goes through the proxy; the blocking recognizer has no pool (keep_alive=False).
+            return await self.run_in_executor(self.recognizer.post_multipart_attempt, url, fields, files, timeout)
+        started = self.recognizer.stage_start()
+        try:
+            body = ACRCloudMultipartEncoder(fields, files)
+        except Exception as e:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
+                                                       'encode_multipart_formdata error'), False
+        self.recognizer.stage_end('encode', started, body.content_length)
+
+        headers = {'Content-Type': body.content_type,
+                   'Content-Length': str(body.content_length),
+                   'Referer': url}
+        try:
+            started = self.recognizer.stage_start()
+            status, reason, data = await self.pool.request('POST', url, body, headers, timeout)
+            self.recognizer.stage_end('network', started, body.content_length + len(data))
+            if status >= 400:
+                return (ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
+                                                            'HTTP Error %d: %s' % (status, reason)),
+                        self.recognizer.retryable_status(status))
+            return data.decode('utf8'), False
+        except ACRCloudPoolExhausted:
+            raise
+        except asyncio.TimeoutError:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, 'timed out'), True
+        except Exception as e:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e)), True
+
+    async def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5,
+                          user_params=None, deadline=None):
+        re = self.recognizer
+        cache_key = re.response_cache_key(host, query_data, query_type, access_key, user_params)
+        if cache_key is not None:
+            res = re.response_cache.get(cache_key)
+            if res is not None:
+                return res
+
+        flight_key = re.single_flight_key(cache_key, host, query_data, query_type, access_key, user_params)
+        if flight_key is not None:
+            waiting = re.single_flight.do_async(flight_key, self.send_identify, host, query_data, query_type,
+                                                access_key, access_secret, timeout, user_params, deadline)
+            try:
+                res = await asyncio.wait_for(waiting, deadline.remaining() if deadline is not None else None)
+            except asyncio.TimeoutError:
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+        else:
+            res = await self.send_identify(host, query_data, query_type, access_key, access_secret, timeout,
+                                           user_params, deadline)
+        if cache_key is not None:
+            re.response_cache.put(cache_key, res, re.json)
+        return res
+
+    async def send_identify(self, host, query_data, query_type, access_key, access_secret, timeout, user_params,
+                            deadline=None):
+        re = self.recognizer
+        if re.retry_policy is not None:
+            re.retry_policy.budget.deposit()
+        tried = []
+        attempt = 0
+        while True:
+            attempt += 1
+            if re.rate_limiter is not None:
+                wait = re.rate_limit_timeout
+                if deadline is not None and wait != 0:
+                    wait = deadline.timeout(wait)
+                    acquired = await re.rate_limiter.acquire_async(wait > 0, wait)
+                else:
+                    acquired = await re.rate_limiter.acquire_async(wait != 0, wait or None)
+                if not acquired:
+                    return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.RATE_LIMIT_ERROR_CODE)
+            if deadline is not None and deadline.expired():
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+            attempt_timeout = deadline.timeout(timeout) if deadline is not None else timeout
+            if re.hedge_policy is not None:
+                res, retryable = await self.send_hedged(host, tried, query_data, query_type, access_key,
+                                                        access_secret, attempt_timeout, user_params)
+            else:
+                res, retryable = await self.send_to(host, tried, query_data, query_type, access_key,
+                                                    access_secret, attempt_timeout, user_params)
+            delay = re.retry_delay(attempt, retryable or re.retryable_result(res), deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        if retryable and deadline is not None and deadline.expired():
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+        return re.annotate_attempts(res, attempt)
+
+    async def send_to(self, host, tried, query_data, query_type, access_key, access_secret, timeout, user_params):
+        # routed here rather than by the caller: a task cancelled before it first runs never
+        # enters this body, and must not have taken a half-open probe slot.
+        re = self.recognizer
+        target = re.route(host, tried)
+        recorded = False
+        try:
+            server_url, fields = re.sign_request(target, query_data, query_type, access_key, access_secret,
+                                                 user_params)
+            if server_url is None:
+                return fields, False
+            started = time.monotonic()
+            try:
+                res, retryable = await self.post_multipart_attempt(server_url, fields, query_data, timeout)
+            except ACRCloudPoolExhausted as e:
+                # as in ACRCloudRecognizer.send_to: no news about target.
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e)), True
+            elapsed = time.monotonic() - started
+            re.record_host(target, elapsed, retryable)
+            recorded = True
+            if re.hedge_policy is not None and not retryable:
+                re.hedge_policy.record(elapsed)
+            return res, retryable
+        finally:
+            if not recorded:
+                re.abandon_host(target)
+
+    async def send_hedged(self, host, tried, query_data, query_type, access_key, access_secret, timeout,
+                          user_params):
+        # as ACRCloudRecognizer.send_hedged; cancelling the losing task closes its connection.
+        re = self.recognizer
+        args = (query_data, query_type, access_key, access_secret, timeout, user_params)
+        policy = re.hedge_policy
+        delay = policy.delay()
+        first = asyncio.ensure_future(self.send_to(host, tried, *args))
+        if delay is None:
+            return await first
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait([first], timeout=delay)
+            if done:
+                return first.result()
+            if (re.rate_limiter is not None and not re.rate_limiter.acquire(False)) or not policy.allow_hedge():
+                return await first
+
+            hedge = asyncio.ensure_future(self.send_to(host, tried, *args))
+            tasks.append(hedge)
+            pending = set(tasks)
+            failed = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    res, retryable = task.result()
+                    if not retryable:
+                        if task is hedge:
+                            policy.won()
+                        return res, retryable
+                    if failed is None:
+                        failed = (res, retryable)
+            return failed
+        finally:
+            # the loser, or both requests when the caller is cancelled while waiting.
+            for task in tasks:
+                task.cancel()
+
+    async def run_in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def create_query_data(self, deadline, func, *args):
+        if deadline is None:
+            return await self.run_in_executor(func, *args)
+        # the executor thread only waits, until the deadline at most: a call that overruns
+        # is abandoned on a deadline worker and does not hold on to the executor.
+        return await self.run_in_executor(self.recognizer.within_deadline, deadline, func, *args)
+
+    async def recognize_audio(self, file_path, start_seconds=0, rec_length=10, user_params=None, audio_type=1,
+                              parse=False, deadline=None):
+        return await self.within_deadline(self._recognize_audio, self.recognizer.create_query_data_audio,
+                                          (file_path, start_seconds, rec_length, audio_type), user_params, parse,
+                                          deadline)
+
+    async def recognize_audio_buffer(self, file_buffer, start_seconds=0, rec_length=10, user_params=None,
+                                     audio_type=1, parse=False, deadline=None):
+        return await self.within_deadline(self._recognize_audio, self.recognizer.create_query_data_audio_buffer,
+                                          (file_buffer, start_seconds, rec_length, audio_type), user_params, parse,
+                                          deadline)
+
+    async def recognize_by_file(self, file_path, start_seconds, rec_length=10, user_params=None, parse=False,
+                                deadline=None):
+        return await self.within_deadline(self._recognize, self.recognizer.create_query_data_by_file,
+                                          (file_path, start_seconds, rec_length), user_params, parse, deadline)
+
+    async def recognize_by_filebuffer(self, file_buffer, start_seconds, rec_length=10, user_params=None, parse=False,
+                                      deadline=None):
+        return await self.within_deadline(self._recognize, self.recognizer.create_query_data_by_filebuffer,
+                                          (file_buffer, start_seconds, rec_length), user_params, parse, deadline)
+
+    async def recognize_by_mmap(self, file_path, start_seconds, rec_length=10, user_params=None, parse=False,
+                                deadline=None):
+        return await self.within_deadline(self._recognize, self.recognizer.create_query_data_by_mmap,
+                                          (file_path, start_seconds, rec_length), user_params, parse, deadline)
+
+    async def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10, user_params=None, parse=False,
+                                    deadline=None):
+        return await self.within_deadline(self._recognize, self.recognizer.create_query_data_by_fpbuffer,
+                                          (fp_buffer, start_seconds, rec_length), user_params, parse, deadline)
+
+    async def recognize(self, wav_audio_buffer, user_params=None, parse=False, deadline=None):
+        return await self.within_deadline(self._recognize, self.recognizer.create_query_data_by_pcm,
+                                          (wav_audio_buffer,), user_params, parse, deadline)
+
+    async def recognize_stream(self, pcm_chunks, window=10, hop=10, user_params=None, parse=False, deadline=None):
+        '''
+        As ACRCloudRecognizer.recognize_stream, for an iterable or async iterable of PCM
+        chunks. Each window is recognized before more of the stream is read.
+        '''
+        ring = ACRCloudPCMRingBuffer.for_windows(window, hop, ACRCloudRecognizer.PCM_BYTES_PER_SECOND)
+        async for chunk in _iterate(pcm_chunks):
+            for start_seconds, pcm in ring.feed(chunk):
+                if deadline is not None:
+                    # an executor thread cut off by the deadline may still be reading the window.
+                    pcm = bytes(pcm)
+                yield start_seconds, await self.recognize(pcm, user_params, parse, deadline)
+
+    async def within_deadline(self, recognize, create_query_data, args, user_params, parse, deadline):
+        # past the deadline the whole call is cancelled: waiting for a slot, for the
+        # executor or for the server. An executor thread that is fingerprinting stops at
+        # its next stage boundary.
+        deadline = ACRCloudDeadline.of(deadline)
+        if deadline is None:
+            return await recognize(create_query_data, args, user_params, parse, None)
+        try:
+            return await asyncio.wait_for(recognize(create_query_data, args, user_params, parse, deadline),
+                                          deadline.remaining())
+        except asyncio.TimeoutError:
+            return self.recognizer.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
+
+    async def _recognize_audio(self, create_query_data, args, user_params, parse, deadline):
+        if user_params is None:
+            user_params = {}
+        async with self.semaphore:
+            try:
+                query_data = await self.create_query_data(deadline, create_query_data, *args)
+                if not query_data['sample'] or len(query_data['sample']) < 16000:
+                    return self.recognizer.error_result(ACRCloudStatusCode.DECODE_ERROR_CODE, '', parse)
+                res = await self.do_recogize(self.host, query_data, 'audio', self.access_key,
+                                             self.access_secret, self.timeout, user_params, deadline)
+                if parse:
+                    res = self.recognizer.check_result(res, parse)
+            except ACRCloudDeadlineExceeded:
+                res = self.recognizer.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
+            except Exception as e:
+                res = self.recognizer.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
+            return res
+
+    async def _recognize(self, create_query_data, args, user_params, parse, deadline=None):
+        if user_params is None:
+            user_params = {}
+        async with self.semaphore:
+            try:
+                query_data = await self.create_query_data(deadline, create_query_data, *args)
+                res = await self.do_recogize(self.host, query_data, self.query_type, self.access_key,
+                                             self.access_secret, self.timeout, user_params, deadline)
+                res = self.recognizer.check_result(res, parse)
+            except ACRCloudDeadlineExceeded:
+                res = self.recognizer.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
+            except Exception as e:
+                res = self.recognizer.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
+            return res
+
+    async def get_duration_ms_by_file(self, file_path):
+        return await self.run_in_executor(ACRCloudRecognizer.get_duration_ms_by_file, file_path)
+
+    async def get_duration_ms_by_filebuffer(self, file_buffer):
+        return await self.run_in_executor(ACRCloudRecognizer.get_duration_ms_by_filebuffer, file_buffer)
+
+    async def get_duration_ms_by_fpbuffer(self, fp_buffer):
+        return await self.run_in_executor(ACRCloudRecognizer.get_duration_ms_by_fpbuffer, fp_buffer)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, collections
+import concurrent.futures
+
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudStatusCode, use_worker_extr_tool
+
+'''
+Batch recognition of many files.
+
+Fingerprints are created by a pool of worker processes (acrcloud_extr_tool is loaded
+once per worker), and each finished fingerprint is handed to a pool of HTTP sender
+threads that share the recognizer's keep-alive connections.
+
+Example:
+    with BatchRecognizer(config, fingerprint_workers=4) as batch:
+        for job, res in batch.recognize_files(['a.mp3', ('b.mp3', 30, 10)], ordered=False):
+            print(job, res)
+'''
+
+_worker_recognizer = None
+
+
+def _init_worker(worker_config):
+    global _worker_recognizer
+    use_worker_extr_tool(worker_config)
+    _worker_recognizer = ACRCloudRecognizer(worker_config)
+
+
+def _create_query_data_by_file(file_path, start_seconds, rec_length):
+    return _worker_recognizer.create_query_data_by_file(file_path, start_seconds, rec_length)
+
+
+class BatchRecognizer:
+    def __init__(self, config, fingerprint_workers=None, http_workers=8, max_pending=None):
+        worker_config = ACRCloudRecognizer.worker_config(config)
+        fingerprint_workers = fingerprint_workers or os.cpu_count() or 1
+        self.recognizer = ACRCloudRecognizer(dict(config, pool_max_per_host=config.get('pool_max_per_host',
+                                                                                       http_workers)))
+        self.fingerprint_pool = concurrent.futures.ProcessPoolExecutor(fingerprint_workers,
+                                                                       initializer=_init_worker,
+                                                                       initargs=(worker_config,))
+        self.http_pool = concurrent.futures.ThreadPoolExecutor(http_workers)
+        self.max_pending = max_pending or 4 * (fingerprint_workers + http_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.fingerprint_pool.shutdown()
+        self.http_pool.shutdown()
+        self.recognizer.close()
+
+    def submit(self, file_path, start_seconds=0, rec_length=10, user_params=None):
+        '''Returns a concurrent.futures.Future that resolves to the recognize_by_file result.'''
+        result = concurrent.futures.Future()
+        fingerprint = self.fingerprint_pool.submit(_create_query_data_by_file, file_path, start_seconds,
+                                                   rec_length)
+
+        def on_fingerprint(done):
+            try:
+                query_data = done.result()
+            except Exception as e:
+                result.set_result(ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE,
+                                                                      str(e)))
+                return
+            self.http_pool.submit(self._send, query_data, user_params, result)
+
+        fingerprint.add_done_callback(on_fingerprint)
+        return result
+
+    def _send(self, query_data, user_params, result):
+        re = self.recognizer
+        try:
+            res = re.do_recogize(re.host, query_data, re.query_type, re.access_key, re.access_secret,
+                                 re.timeout, user_params)
+            res = re.check_result(res)
+        except Exception as e:
+            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+        result.set_result(res)
+
+    def recognize_files(self, jobs, ordered=True, user_params=None):
+        '''
+        Recognize every job and yield (job, result).
+
+        A job is a file path or a (file_path, start_seconds[, rec_length]) tuple. With
+        ordered=True results come back in job order, otherwise as soon as each completes.
+        At most max_pending jobs are in flight at once.
+        '''
+        pending = collections.deque() if ordered else {}
+        for job in jobs:
+            args = (job,) if isinstance(job, str) else tuple(job)
+            future = self.submit(*args, user_params=user_params)
+            if ordered:
+                pending.append((job, future))
+                while len(pending) >= self.max_pending:
+                    done_job, done = pending.popleft()
+                    yield done_job, done.result()
+            else:
+                pending[future] = job
+                if len(pending) >= self.max_pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+
+        if ordered:
+            while pending:
+                done_job, done = pending.popleft()
+                yield done_job, done.result()
+        else:
+            for future in concurrent.futures.as_completed(list(pending)):
+                yield pending.pop(future), future.result()
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Benchmarking tools that need no ACRCloud account.
+
+    acrcloud.bench.emulator  local HTTPS stand-in for /v1/identify
+    acrcloud.bench.load      load generator reporting req/s, latency, CPU and RSS
+
+python -m acrcloud.bench runs the load generator against the emulator for each
+client mode.
+'''
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, argparse
+
+from acrcloud.bench.emulator import ACRCloudEmulatorProcess, ACRCloudLognormalLatency, client_ssl_context
+from acrcloud.bench.load import ACRCloudLoadGenerator, ACRCloudLoadReport, MODES
+from acrcloud.recognizer import use_extr_tool
+
+'''
+Baseline load test: starts the identify emulator in a child process and runs the load
+generator against it once per client mode.
+
+    python -m acrcloud.bench --file a.mp3 --requests 1000 --concurrency 16 --latency-ms 30
+    python -m acrcloud.bench --fingerprint-bytes 1000 --modes sync async --histogram
+    python -m acrcloud.bench --extr-tool stub --file any.mp3 --fingerprint-cost 0.005
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m acrcloud.bench')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--file', help='media file each call recognizes')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--length', type=int, default=10)
+    parser.add_argument('--fingerprint-bytes', type=int, default=1000,
+                        help='without --file, send a fingerprint of this size (no decoding)')
+    parser.add_argument('--fingerprint-workers', type=int, help='batch mode worker processes')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='median emulator latency')
+    parser.add_argument('--sigma', type=float, default=0.0, help='log-normal sigma of the latency (0: fixed)')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--histogram', action='store_true', help='print a latency histogram per mode')
+    parser.add_argument('--extr-tool', choices=('native', 'stub'), help='fingerprinting backend')
+    parser.add_argument('--decode-cost', type=float, default=0.0,
+                        help='stub CPU seconds per second of audio decoded')
+    parser.add_argument('--fingerprint-cost', type=float, default=0.0,
+                        help='stub CPU seconds per second of audio fingerprinted')
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    if args.sigma > 0:
+        latency = ACRCloudLognormalLatency(latency, args.sigma, args.seed)
+    modes = args.modes
+    if args.file is None and 'batch' in modes:
+        modes = [mode for mode in modes if mode != 'batch']
+        print('batch mode skipped: it needs --file')
+    fp_buffer = None if args.file else os.urandom(args.fingerprint_bytes)
+
+    if args.extr_tool == 'stub':
+        use_extr_tool('stub', {'decode_cost': args.decode_cost, 'fingerprint_cost': args.fingerprint_cost})
+    elif args.extr_tool is not None:
+        use_extr_tool(args.extr_tool)
+
+    with ACRCloudEmulatorProcess(latency=latency, access_keys={'bench': 'bench'}) as server:
+        config = {'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                  'ssl_context': client_ssl_context(), 'pool_max_per_host': args.concurrency}
+        load = ACRCloudLoadGenerator(config, args.file, fp_buffer, args.start, args.length,
+                                     args.fingerprint_workers)
+        print(ACRCloudLoadReport.HEADER)
+        reports = []
+        for mode in modes:
+            reports.append(load.run(mode, args.requests, args.concurrency))
+            print(reports[-1].row())
+        if args.histogram:
+            for report in reports:
+                print('\n' + report.mode)
+                print(report.histogram())
+        requests, invalid = server.stats()
+        print('\nemulator: %d requests, %d rejected' % (requests, invalid))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, ssl, json, hmac, math, time, base64, random, shutil, hashlib, tempfile, threading, subprocess
+import http.server
+import multiprocessing
+import urllib.parse
+
+'''
+Local stand-in for the ACRCloud identify API, for benchmarks and load tests.
+
+ACRCloudIdentifyEmulator is a threaded HTTPS server that checks every POST as the
+service would (multipart fields, sample sizes and, for known access keys, the
+HMAC-SHA1 signature) and answers after a configurable latency with a canned response.
+Invalid requests get the service's error bodies. Nothing here needs acrcloud_extr_tool.
+
+Example:
+    with ACRCloudIdentifyEmulator(ACRCloudLognormalLatency(0.05), access_keys={'key': 'secret'}) as server:
+        re = ACRCloudRecognizer({'host': server.host, 'access_key': 'key', 'access_secret': 'secret',
+                                 'ssl_context': client_ssl_context()})
+        print(re.recognize_by_file('a.mp3', 0))
+'''
+
+DEFAULT_RESPONSE = {
+    'status': {'msg': 'Success', 'code': 0, 'version': '1.0'},
+    'metadata': {'music': [{'title': 'Benchmark', 'acrid': '0' * 32, 'score': 100,
+                            'play_offset_ms': 5000, 'duration_ms': 180000}]},
+    'result_type': 0,
+    'cost_time': 0.01
+}
+
+# the service answers these with HTTP 200 and a status in the body.
+INVALID_ACCESS_KEY_CODE = 3001
+INVALID_ARGUMENTS_CODE = 3006
+INVALID_SIGNATURE_CODE = 3014
+
+ERROR_MSG = {
+    INVALID_ACCESS_KEY_CODE: 'Missing/Invalid Access Key',
+    INVALID_ARGUMENTS_CODE: 'Invalid Arguments',
+    INVALID_SIGNATURE_CODE: 'Invalid Signature'
+}
+
+REQUIRED_FIELDS = ('access_key', 'sample_bytes', 'timestamp', 'signature', 'data_type', 'signature_version')
+
+
+class ACRCloudLognormalLatency:
+    '''Response latencies (seconds) from a log-normal distribution with the given median.'''
+
+    def __init__(self, median, sigma=0.5, seed=None):
+        self.mu = math.log(median)
+        self.sigma = sigma
+        self.random = random.Random(seed)
+
+    def __call__(self):
+        return self.random.lognormvariate(self.mu, self.sigma)
+
+
+class ACRCloudTailLatency:
+    '''base seconds per response, but tail seconds for a tail_share of them.'''
+
+    def __init__(self, base, tail, tail_share=0.05, seed=None):
+        self.base = base
+        self.tail = tail
+        self.tail_share = tail_share
+        self.random = random.Random(seed)
+
+    def __call__(self):
+        return self.tail if self.random.random() < self.tail_share else self.base
+
+
+def parse_multipart(content_type, body):
+    '''Split a multipart/form-data body into (fields, files); ValueError when malformed.'''
+    kind, _, params = content_type.partition(';')
+    boundary = None
+    for param in params.split(';'):
+        k, _, v = param.strip().partition('=')
+        if k.lower() == 'boundary':
+            boundary = v.strip('"')
+    if kind.strip().lower() != 'multipart/form-data' or not boundary:
+        raise ValueError('not multipart/form-data')
+
+    parts = body.split(b'--' + boundary.encode('latin-1'))
+    if len(parts) < 3 or not parts[-1].startswith(b'--'):
+        raise ValueError('unterminated multipart body')
+    fields, files = {}, {}
+    for part in parts[1:-1]:
+        if not part.startswith(b'\r\n') or not part.endswith(b'\r\n'):
+            raise ValueError('malformed part')
+        head, sep, value = part[2:-2].partition(b'\r\n\r\n')
+        if not sep:
+            raise ValueError('part without headers')
+        disposition = {}
+        for line in head.decode('utf-8').split('\r\n'):
+            name, _, v = line.partition(':')
+            if name.strip().lower() == 'content-disposition':
+                for item in v.split(';')[1:]:
+                    k, _, v = item.strip().partition('=')
+                    disposition[k] = v.strip('"')
+        if 'name' not in disposition:
+            raise ValueError('part without a name')
+        if 'filename' in disposition:
+            files[disposition['name']] = value
+        else:
+            fields[disposition['name']] = value.decode('utf-8')
+    return fields, files
+
+
+def make_self_signed_cert(directory):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                           '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def client_ssl_context():
+    '''An SSL context that accepts the emulator's self-signed certificate.'''
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class _IdentifyHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests += 1
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+        delay = server.latency
+        if callable(delay):
+            delay = delay()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.send_response(server.fail_status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        error, fields, files = server.emulator.check_request(urllib.parse.urlsplit(self.path).path,
+                                                             self.headers.get('Content-Type', ''), body)
+        if error is not None:
+            with server.lock:
+                server.invalid += 1
+            data = json.dumps({'status': {'msg': ERROR_MSG[error[0]] + ':' + error[1], 'code': error[0],
+                                          'version': '1.0'}}).encode('utf8')
+        else:
+            data = server.emulator.response_body(fields, files)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _IdentifyServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops concurrent connects, which then wait a 1 s SYN retry.
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients hang up on purpose (aborted hedges, timeouts); nothing to report.
+        pass
+
+
+class ACRCloudIdentifyEmulator:
+    '''
+    Threaded HTTPS server emulating POST /v1/identify (any path is accepted).
+
+    latency is seconds per response or a function returning them (see
+    ACRCloudLognormalLatency). response is the body of valid requests: a dict, str or
+    bytes, or a function of the request's (fields, files) returning one. access_keys
+    maps access keys to secrets; when given, other keys are rejected and signatures are
+    verified. With validate=False every request gets the response.
+
+    requests counts POSTs and invalid the ones rejected. Setting failures to n answers
+    the next n POSTs with HTTP fail_status instead.
+    '''
+
+    def __init__(self, latency=0.0, response=None, access_keys=None, validate=True, address='127.0.0.1',
+                 port=0):
+        self.response = DEFAULT_RESPONSE if response is None else response
+        self._response_body = None if callable(self.response) else self.encode_response(self.response)
+        self.access_keys = access_keys
+        self.validate = validate
+
+        self._tmpdir = tempfile.mkdtemp(prefix='acrcloud-emulator-')
+        cert, key = make_self_signed_cert(self._tmpdir)
+        self.httpd = _IdentifyServer((address, port), _IdentifyHandler)
+        self.httpd.emulator = self
+        self.httpd.latency = latency
+        self.httpd.requests = 0
+        self.httpd.invalid = 0
+        self.httpd.failures = 0
+        self.httpd.fail_status = 503
+        self.httpd.lock = threading.Lock()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.host = '%s:%d' % (address, self.httpd.server_address[1])
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    @property
+    def latency(self):
+        return self.httpd.latency
+
+    @latency.setter
+    def latency(self, value):
+        self.httpd.latency = value
+
+    @property
+    def failures(self):
+        return self.httpd.failures
+
+    @failures.setter
+    def failures(self, value):
+        self.httpd.failures = value
+
+    @property
+    def fail_status(self):
+        return self.httpd.fail_status
+
+    @fail_status.setter
+    def fail_status(self, value):
+        self.httpd.fail_status = value
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @requests.setter
+    def requests(self, value):
+        self.httpd.requests = value
+
+    @property
+    def invalid(self):
+        return self.httpd.invalid
+
+    @invalid.setter
+    def invalid(self, value):
+        self.httpd.invalid = value
+
+    @staticmethod
+    def encode_response(response):
+        if isinstance(response, bytes):
+            return response
+        if isinstance(response, str):
+            return response.encode('utf8')
+        return json.dumps(response).encode('utf8')
+
+    def response_body(self, fields=None, files=None):
+        if self._response_body is not None:
+            return self._response_body
+        return self.encode_response(self.response(fields, files))
+
+    def check_request(self, path, content_type, body):
+        '''
+        Returns (error, fields, files): error is None for a valid identify request, else
+        (error code, detail). fields and files are None when validate is off.
+        '''
+        if not self.validate:
+            return None, None, None
+        try:
+            fields, files = parse_multipart(content_type, body)
+        except ValueError as e:
+            return (INVALID_ARGUMENTS_CODE, str(e)), None, None
+        return self.check_fields(path, fields, files), fields, files
+
+    def check_fields(self, path, fields, files):
+        missing = [name for name in REQUIRED_FIELDS if name not in fields]
+        if missing:
+            return INVALID_ARGUMENTS_CODE, 'missing ' + ', '.join(missing)
+        if 'sample' not in files and 'sample_hum' not in files:
+            return INVALID_ARGUMENTS_CODE, 'no sample'
+        for name in ('sample', 'sample_hum'):
+            if name in files and fields.get(name + '_bytes') != str(len(files[name])):
+                return INVALID_ARGUMENTS_CODE, '%s_bytes does not match the %s sent' % (name, name)
+        if self.access_keys is None:
+            return None
+        secret = self.access_keys.get(fields['access_key'])
+        if secret is None:
+            return INVALID_ACCESS_KEY_CODE, fields['access_key']
+        string_to_sign = '\n'.join(('POST', path, fields['access_key'], fields['data_type'],
+                                    fields['signature_version'], fields['timestamp']))
+        expected = base64.b64encode(hmac.new(secret.encode('ascii'), string_to_sign.encode('ascii'),
+                                             digestmod=hashlib.sha1).digest()).decode('ascii')
+        if not hmac.compare_digest(expected, fields['signature']):
+            return INVALID_SIGNATURE_CODE, fields['access_key']
+        return None
+
+
+def _serve_emulator(conn, kwargs):
+    with ACRCloudIdentifyEmulator(**kwargs) as server:
+        conn.send(server.host)
+        while conn.recv() == 'stats':
+            conn.send((server.requests, server.invalid))
+
+
+class ACRCloudEmulatorProcess:
+    '''
+    ACRCloudIdentifyEmulator(**kwargs) in a child process, so that its CPU time is not
+    counted against the client being measured. stats() returns (requests, invalid).
+    '''
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.host = None
+        self._conn = None
+        self._process = None
+
+    def __enter__(self):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_emulator, args=(child, self.kwargs), daemon=True)
+        self._process.start()
+        child.close()
+        self.host = self._conn.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.send('stop')
+        self._process.join()
+        self._conn.close()
+
+    def stats(self):
+        self._conn.send('stats')
+        return self._conn.recv()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, json, time, array, hashlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+'''
+Pure-Python stand-in for the native acrcloud_extr_tool module, for benchmarks and CI.
+
+Select it for the whole process with ACRCLOUD_EXTR_TOOL=stub in the environment or
+acrcloud.recognizer.use_extr_tool('stub'). Settings come from configure() (or
+use_extr_tool's settings) or ACRCLOUD_EXTR_TOOL_SETTINGS (JSON); settings() returns
+them, e.g. for worker processes.
+
+Every "file" is a synthetic recording of duration_seconds whose audio is derived
+from the file name (or the size and first 64 KiB of the file buffer) and the second, so
+different files and different windows of a file decode to different PCM while the
+same window always decodes to the same PCM, however it is reached. Decoding burns
+decode_cost CPU seconds per second of audio decoded (from the beginning of the
+file, like a seeking decoder) and fingerprinting burns fingerprint_cost per second
+of audio fingerprinted (sleeping instead when fingerprint_releases_gil is set, like
+a native module that drops the GIL). Fingerprints are fingerprint_bytes_per_second
+(humming_bytes_per_second) long and derived from the PCM, so equal audio gives equal
+fingerprints. PCM whose mean absolute amplitude is below silence_threshold gets an
+empty fingerprint, as the native module does for mute audio. Decoding a file named
+in stall_files first burns stall_seconds, like a corrupt file that hangs the
+decoder. The counters record how much audio each call processed.
+'''
+
+duration_seconds = 3600
+decode_cost = 0.0
+fingerprint_cost = 0.0
+fingerprint_bytes_per_second = 100
+humming_bytes_per_second = 100
+fingerprint_releases_gil = False
+silence_threshold = 0
+stall_files = ()
+stall_seconds = 0.0
+
+counters = {'decoded_seconds': 0.0, 'fingerprinted_seconds': 0.0, 'calls': 0}
+
+def configure(**kwargs):
+    unknown = [key for key in kwargs if key not in _SETTINGS]
+    if unknown:
+        raise ValueError('unknown stub settings: %s' % ', '.join(sorted(unknown)))
+    globals().update(kwargs)
+    reset()
+
+
+def settings():
+    return dict((key, globals()[key]) for key in _SETTINGS)
+
+
+def reset():
+    for key in counters:
+        counters[key] = 0
+
+
+def _burn(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def _clip(start_seconds, audio_len_seconds):
+    start = min(max(0, start_seconds), duration_seconds)
+    if not audio_len_seconds:
+        return start, duration_seconds - start
+    return start, min(audio_len_seconds, duration_seconds - start)
+
+
+def _file_source(file_name):
+    return os.fsencode(file_name)
+
+
+def _buffer_source(data_buffer):
+    # only the head is read, so that an mmap'ed file is not faulted in as a whole.
+    data_buffer = memoryview(data_buffer)
+    return hashlib.sha1(b'%d:%s' % (data_buffer.nbytes, data_buffer[:65536].tobytes())).digest()
+
+
+def _pcm(seconds, source=b'', start_seconds=0):
+    # one block of 8000 samples per second of the recording, seeded by (source, second).
+    first = int(start_seconds)
+    skip = int((start_seconds - first) * 8000) * 2
+    size = int(seconds * 8000) * 2
+    blocks = []
+    for second in range(first, first + (skip + size + 15999) // 16000):
+        blocks.append(hashlib.shake_128(b'%s:%d' % (source, second)).digest(16000))
+    return b''.join(blocks)[skip:skip + size]
+
+
+def _stall(file_name):
+    if file_name in stall_files:
+        _burn(stall_seconds)
+
+
+def _decode(source, start_seconds, audio_len_seconds):
+    start, length = _clip(start_seconds, audio_len_seconds)
+    counters['decoded_seconds'] += start + length
+    _burn((start + length) * decode_cost)
+    return _pcm(length, source, start)
+
+
+def _mean_amplitude(pcm):
+    usable = len(pcm) // 2 * 2
+    if not usable:
+        return 0
+    if numpy is not None:
+        return float(numpy.abs(numpy.frombuffer(pcm, dtype=numpy.int16, count=usable // 2).astype(numpy.int32)).mean())
+    samples = array.array('h', pcm[:usable])
+    return sum(map(abs, samples)) / float(len(samples))
+
+
+def _fingerprint(pcm, bytes_per_second):
+    seconds = len(pcm) / 16000.0
+    counters['fingerprinted_seconds'] += seconds
+    counters['calls'] += 1
+    if fingerprint_releases_gil:
+        time.sleep(seconds * fingerprint_cost)
+    else:
+        _burn(seconds * fingerprint_cost)
+    if silence_threshold and _mean_amplitude(pcm) < silence_threshold:
+        return b''
+    digest = hashlib.sha1(pcm).digest()
+    size = int(seconds * bytes_per_second)
+    return (digest * (size // len(digest) + 1))[:size]
+
+
+def set_debug():
+    pass
+
+
+def version():
+    return 'stub'
+
+
+def decode_audio_by_file(file_name, start_time_seconds, audio_len_seconds, *args):
+    _stall(file_name)
+    return _decode(_file_source(file_name), start_time_seconds, audio_len_seconds)
+
+
+def decode_audio_by_filebuffer(data_buffer, start_time_seconds, audio_len_seconds, *args):
+    return _decode(_buffer_source(data_buffer), start_time_seconds, audio_len_seconds)
+
+
+def create_fingerprint(data_buffer, is_db_fingerprint, opt=None):
+    return _fingerprint(bytes(data_buffer), fingerprint_bytes_per_second)
+
+
+def create_humming_fingerprint(data_buffer, *args):
+    return _fingerprint(bytes(data_buffer), humming_bytes_per_second)
+
+
+def create_fingerprint_by_file(file_name, start_time_seconds, audio_len_seconds, is_db_fingerprint, opt=None):
+    _stall(file_name)
+    pcm = _decode(_file_source(file_name), start_time_seconds, audio_len_seconds)
+    return _fingerprint(pcm, fingerprint_bytes_per_second)
+
+
+def create_fingerprint_by_filebuffer(data_buffer, start_time_seconds, audio_len_seconds, is_db_fingerprint,
+                                     opt=None):
+    pcm = _decode(_buffer_source(data_buffer), start_time_seconds, audio_len_seconds)
+    return _fingerprint(pcm, fingerprint_bytes_per_second)
+
+
+def create_humming_fingerprint_by_file(file_name, start_time_seconds, audio_len_seconds, *args):
+    _stall(file_name)
+    pcm = _decode(_file_source(file_name), start_time_seconds, audio_len_seconds)
+    return _fingerprint(pcm, humming_bytes_per_second)
+
+
+def create_humming_fingerprint_by_filebuffer(data_buffer, start_time_seconds, audio_len_seconds, *args):
+    pcm = _decode(_buffer_source(data_buffer), start_time_seconds, audio_len_seconds)
+    return _fingerprint(pcm, humming_bytes_per_second)
+
+
+def create_fingerprint_by_fpbuffer(fp_buffer, start_time_seconds, audio_len_seconds):
+    return bytes(fp_buffer)
+
+
+def get_duration_ms_by_file(file_name):
+    return int(duration_seconds * 1000)
+
+
+def get_duration_ms_by_filebuffer(data_buffer):
+    return int(duration_seconds * 1000)
+
+
+def get_duration_ms_by_fpbuffer(fp_buffer):
+    return int(duration_seconds * 1000)
+
+
+_SETTINGS = ('duration_seconds', 'decode_cost', 'fingerprint_cost', 'fingerprint_bytes_per_second',
+             'humming_bytes_per_second', 'fingerprint_releases_gil', 'silence_threshold', 'stall_files',
+             'stall_seconds')
+
+if os.environ.get('ACRCLOUD_EXTR_TOOL_SETTINGS'):
+    configure(**json.loads(os.environ['ACRCLOUD_EXTR_TOOL_SETTINGS']))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import json, time, asyncio, resource, threading
+
+from acrcloud.recognizer import ACRCloudRecognizer
+from acrcloud.async_recognizer import AsyncACRCloudRecognizer
+from acrcloud.batch import BatchRecognizer
+
+'''
+Load generator for the recognizer clients.
+
+ACRCloudLoadGenerator sends a number of identify calls through one client mode with a
+fixed number of calls in flight and returns an ACRCloudLoadReport: requests per
+second, latency percentiles and histogram, errors, CPU seconds and RSS.
+
+Modes:
+    sync               ACRCloudRecognizer shared by concurrency threads (keep-alive pool)
+    sync-no-keepalive  the same with keep_alive=False (a connection per request)
+    async              AsyncACRCloudRecognizer with concurrency tasks
+    batch              BatchRecognizer with concurrency HTTP workers (file_path only)
+
+Example:
+    with ACRCloudIdentifyEmulator() as server:
+        load = ACRCloudLoadGenerator({'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                                      'ssl_context': client_ssl_context()}, file_path='a.mp3')
+        print(load.run('async', 1000, concurrency=32))
+'''
+
+MODES = ('sync', 'sync-no-keepalive', 'async', 'batch')
+
+
+def rss_kb():
+    '''Current resident set size in kilobytes (peak RSS where /proc is missing).'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cpu_seconds():
+    # worker processes (batch mode) are counted once they have exited.
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+class ACRCloudLoadReport:
+    def __init__(self, mode, latencies, errors, elapsed, cpu, rss):
+        self.mode = mode
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+        self.cpu = cpu
+        self.rss = rss
+
+    HEADER = '%-18s %8s %8s %9s %9s %9s %9s %8s %8s' % ('mode', 'calls', 'errors', 'req/s', 'p50 ms', 'p99 ms',
+                                                       'max ms', 'cpu s', 'rss MB')
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def requests_per_second(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1, max(0, int(round(pct / 100.0 * len(self.latencies))) - 1))
+        return self.latencies[index]
+
+    def histogram(self, width=40):
+        '''Latencies in power-of-two millisecond buckets, one text line per bucket.'''
+        buckets = {}
+        for seconds in self.latencies:
+            bound = 1
+            while bound < seconds * 1000:
+                bound *= 2
+            buckets[bound] = buckets.get(bound, 0) + 1
+        if not buckets:
+            return ''
+        most = max(buckets.values())
+        lines = []
+        bound = min(buckets)
+        while bound <= max(buckets):
+            count = buckets.get(bound, 0)
+            lines.append('%8s %-*s %d' % ('<=%dms' % bound, width, '#' * int(round(count * width / float(most))),
+                                          count))
+            bound *= 2
+        return '\n'.join(lines)
+
+    def row(self):
+        return '%-18s %8d %8d %9.1f %9.1f %9.1f %9.1f %8.2f %8.1f' % (
+            self.mode, self.requests, self.errors, self.requests_per_second, self.percentile(50) * 1000,
+            self.percentile(99) * 1000, (self.latencies[-1] if self.latencies else 0) * 1000, self.cpu,
+            self.rss / 1024.0)
+
+    def __str__(self):
+        return self.HEADER + '\n' + self.row()
+
+
+class ACRCloudLoadGenerator:
+    '''
+    Every call recognizes file_path from start_seconds (recognize_by_file) or, when
+    fp_buffer is given, that fingerprint (recognize_by_fpbuffer: no decoding).
+    '''
+
+    def __init__(self, config, file_path=None, fp_buffer=None, start_seconds=0, rec_length=10,
+                 fingerprint_workers=None):
+        if file_path is None and fp_buffer is None:
+            raise ValueError('file_path or fp_buffer is required')
+        self.config = config
+        self.file_path = file_path
+        self.fp_buffer = fp_buffer
+        self.start_seconds = start_seconds
+        self.rec_length = rec_length
+        self.fingerprint_workers = fingerprint_workers
+
+    def run(self, mode, requests, concurrency=8):
+        if mode not in MODES:
+            raise ValueError('unknown load mode: %r' % (mode,))
+        run = getattr(self, 'run_' + mode.replace('-', '_'))
+        cpu = cpu_seconds()
+        started = time.perf_counter()
+        latencies, errors, rss = run(requests, max(1, concurrency))
+        elapsed = time.perf_counter() - started
+        return ACRCloudLoadReport(mode, latencies, errors, elapsed, cpu_seconds() - cpu, rss)
+
+    def run_sync(self, requests, concurrency, config=None):
+        re = ACRCloudRecognizer(config or self.config)
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        remaining = [requests]
+
+        def caller():
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                started = time.perf_counter()
+                if self.fp_buffer is not None:
+                    res = re.recognize_by_fpbuffer(self.fp_buffer, self.start_seconds, self.rec_length, parse=True)
+                else:
+                    res = re.recognize_by_file(self.file_path, self.start_seconds, self.rec_length, parse=True)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors[0] += res.status_code != 0
+
+        threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        rss = rss_kb()
+        re.close()
+        return latencies, errors[0], rss
+
+    def run_sync_no_keepalive(self, requests, concurrency):
+        return self.run_sync(requests, concurrency, dict(self.config, keep_alive=False))
+
+    def run_async(self, requests, concurrency):
+        return asyncio.run(self._run_async(requests, concurrency))
+
+    async def _run_async(self, requests, concurrency):
+        re = AsyncACRCloudRecognizer(dict(self.config, max_concurrency=concurrency))
+        latencies, errors = [], [0]
+        remaining = [requests]
+
+        async def caller():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                if self.fp_buffer is not None:
+                    res = await re.recognize_by_fpbuffer(self.fp_buffer, self.start_seconds, self.rec_length,
+                                                         parse=True)
+                else:
+                    res = await re.recognize_by_file(self.file_path, self.start_seconds, self.rec_length,
+                                                     parse=True)
+                latencies.append(time.perf_counter() - started)
+                errors[0] += res.status_code != 0
+
+        await asyncio.gather(*[caller() for _ in range(concurrency)])
+        rss = rss_kb()
+        await re.close()
+        return latencies, errors[0], rss
+
+    def run_batch(self, requests, concurrency):
+        if self.file_path is None:
+            raise ValueError('batch mode recognizes files: file_path is required')
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(concurrency)
+        batch = BatchRecognizer(self.config, self.fingerprint_workers, http_workers=concurrency)
+        try:
+            futures = []
+            for _ in range(requests):
+                in_flight.acquire()
+                started = time.perf_counter()
+                future = batch.submit(self.file_path, self.start_seconds, self.rec_length)
+                future.add_done_callback(lambda done, started=started: self._batch_done(done, started, latencies,
+                                                                                         errors, lock, in_flight))
+                futures.append(future)
+            for future in futures:
+                future.result()
+            rss = rss_kb()
+        finally:
+            batch.close()
+        return latencies, errors[0], rss
+
+    @staticmethod
+    def _batch_done(done, started, latencies, errors, lock, in_flight):
+        elapsed = time.perf_counter() - started
+        try:
+            failed = json.loads(done.result())['status']['code'] != 0
+        except Exception:
+            failed = True
+        with lock:
+            latencies.append(elapsed)
+            errors[0] += failed
+        in_flight.release()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, time, hashlib, threading, collections
+
+from acrcloud.result import ACRCloudJson, ACRCloudStatusCode
+
+'''
+Work the recognizer avoids repeating: ACRCloudFingerprintCache (in memory, optionally
+backed by sqlite), ACRCloudResponseCache for identify responses and ACRCloudSingleFlight,
+which lets concurrent identical requests share one. Re-exported by acrcloud.recognizer.
+'''
+
+
+class ACRCloudFingerprintCache:
+    '''
+    Content-addressed cache of fingerprints (the query_data dicts sent to identify).
+
+    Keys combine a hash of the audio content with every option that changes the
+    fingerprint, so repeated media skips decoding and fingerprinting entirely. The
+    memory tier is an LRU bounded by max_bytes of fingerprint data; when path is given,
+    entries are also persisted in a SQLite database there and survive restarts. Keys
+    include the fingerprinting backend's version, so entries made by another backend
+    (e.g. the stub) are never served. A database error (e.g. locked by another
+    process) makes a lookup a miss and a store memory-only. hits, disk_hits, misses,
+    evictions and disk_errors count cache activity.
+    '''
+
+    HASH_CHUNK = 1 << 20
+
+    def __init__(self, max_bytes=64 << 20, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        self._bytes = 0
+        self._entries = collections.OrderedDict()
+        self._file_digests = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            import sqlite3
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS fingerprints '
+                             '(key TEXT PRIMARY KEY, sample BLOB, sample_hum BLOB)')
+            self._db.commit()
+
+    @staticmethod
+    def key(backend_version, content_digest, start_seconds, rec_length, recognize_type, opt):
+        return '%s:%s:%s:%s:%s:%s' % (backend_version, content_digest, start_seconds, rec_length, recognize_type,
+                                      ','.join('%s=%s' % item for item in sorted(opt.items())))
+
+    @staticmethod
+    def buffer_digest(buffer):
+        return hashlib.sha1(buffer).hexdigest()
+
+    def file_digest(self, file_path):
+        # hashing is remembered per (path, size, mtime) so scanning one file window by
+        # window reads it only once.
+        st = os.stat(file_path)
+        stamp = (file_path, st.st_size, st.st_mtime_ns)
+        digest = self._file_digests.get(stamp)
+        if digest is None:
+            h = hashlib.sha1()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.HASH_CHUNK), b''):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            if len(self._file_digests) >= 1024:
+                self._file_digests.clear()
+            self._file_digests[stamp] = digest
+        return digest
+
+    def get(self, key):
+        with self._lock:
+            query_data = self._entries.get(key)
+            if query_data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return query_data
+            if self._db is not None:
+                import sqlite3
+                try:
+                    row = self._db.execute('SELECT sample, sample_hum FROM fingerprints WHERE key = ?',
+                                           (key,)).fetchone()
+                except sqlite3.Error:
+                    self.disk_errors += 1
+                    row = None
+                if row is not None:
+                    query_data = dict((name, bytes(value)) for name, value in zip(('sample', 'sample_hum'), row)
+                                      if value is not None)
+                    self.disk_hits += 1
+                    self._remember(key, query_data)
+                    return query_data
+            self.misses += 1
+            return None
+
+    def put(self, key, query_data):
+        # only complete fingerprints are worth keeping; errors must be retried.
+        if not query_data or not all(query_data.values()):
+            return
+        with self._lock:
+            self._remember(key, query_data)
+            if self._db is not None:
+                import sqlite3
+                try:
+                    self._db.execute('INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)',
+                                     (key, query_data.get('sample'), query_data.get('sample_hum')))
+                    self._db.commit()
+                except sqlite3.Error:
+                    self.disk_errors += 1
+                    try:
+                        self._db.rollback()
+                    except sqlite3.Error:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'disk_errors': self.disk_errors, 'entries': len(self._entries),
+                    'bytes': self._bytes}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, query_data):
+        size = sum(len(value) for value in query_data.values())
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= sum(len(value) for value in old.values())
+        self._entries[key] = query_data
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sum(len(value) for value in evicted.values())
+            self.evictions += 1
+
+
+class ACRCloudResponseCache:
+    '''
+    TTL cache of identify responses, keyed by a digest of the fingerprint payload, the
+    endpoint and the request parameters. Successful results live for ttl seconds and
+    "No Result" (1001) answers for the shorter no_result_ttl; other errors are never
+    cached. At most max_entries responses are kept (least recently used go first).
+    '''
+
+    def __init__(self, max_entries=1024, ttl=300, no_result_ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.no_result_ttl = no_result_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()  # key -> (expires_at, res)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, endpoint, query_type, access_key, query_data, user_params=None):
+        h = hashlib.sha1()
+        h.update(('%s\n%s\n%s\n%s\n' % (host, endpoint, query_type, access_key)).encode('utf8'))
+        for name in sorted(query_data):
+            value = query_data[name]
+            if value is None:
+                return None
+            h.update(('%s:%d\n' % (name, len(value))).encode('utf8'))
+            h.update(value)
+        for k, v in sorted((user_params or {}).items()):
+            h.update(('%s=%s\n' % (k, v)).encode('utf8'))
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, res, json=None):
+        '''json: the ACRCloudJson backend to read res with (default 'auto').'''
+        try:
+            code = (json or ACRCloudJson.get()).loads(res)['status']['code']
+        except Exception as e:
+            return
+        if code == 0:
+            ttl = self.ttl
+        elif code == ACRCloudStatusCode.NO_RESULT_CODE:
+            ttl = self.no_result_ttl
+        else:
+            return
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, res)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+class ACRCloudSingleFlight:
+    '''
+    Coalesces concurrent identical identify requests: while a request for a key is in
+    flight, other callers with the same key wait for it and get its result instead of
+    sending their own. do() is for threads, do_async() for asyncio tasks; a thread that
+    waits longer than timeout gets TimeoutError. requests and coalesced count callers and
+    the callers that were served by another's request.
+    '''
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self._calls = {}  # key -> [threading.Event, result, exception]
+        self._tasks = {}  # key -> asyncio future
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, timeout=None):
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+            else:
+                self.coalesced += 1
+        if not leader:
+            if not call[0].wait(timeout):
+                raise TimeoutError()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = func(*args)
+            return call[1]
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call[0].set()
+
+    async def do_async(self, key, coro_func, *args):
+        import asyncio
+        with self._lock:
+            self.requests += 1
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(coro_func(*args))
+                task.add_done_callback(lambda done: self._tasks.pop(key, None))
+            else:
+                self.coalesced += 1
+        # shielded: one caller being cancelled must not cancel the request for the others.
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'coalesced': self.coalesced,
+                    'coalescing_ratio': self.coalesced / float(self.requests) if self.requests else 0.0}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import threading, collections
+
+'''
+Per-stage timing hooks of the recognizer. Re-exported by acrcloud.recognizer.
+'''
+
+
+class ACRCloudInstrument:
+    '''
+    Receives the duration (monotonic seconds) and byte count of every stage of a
+    recognition: decode, fingerprint, sign, encode, network and parse.
+
+    This base class is the recognizer's default and does nothing; because enabled is
+    False the recognizer does not even read the clock. Subclass it, set enabled = True
+    and override record() to collect timings, or use ACRCloudStageStats.
+    '''
+
+    enabled = False
+
+    def record(self, stage, seconds, nbytes=0):
+        pass
+
+
+class ACRCloudStageStats(ACRCloudInstrument):
+    '''
+    Instrument that aggregates stage timings and reports p50/p95/p99 per stage over the
+    last max_samples recordings of each stage. Safe to share between threads.
+    '''
+
+    enabled = True
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = collections.Counter()
+        self._bytes = collections.Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, nbytes=0):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = collections.deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            self._counts[stage] += 1
+            self._bytes[stage] += nbytes
+
+    @staticmethod
+    def percentile(ordered, pct):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+    def summary(self):
+        with self._lock:
+            stages = dict((stage, sorted(samples)) for stage, samples in self._samples.items())
+            counts = dict(self._counts)
+            nbytes = dict(self._bytes)
+        res = {}
+        for stage, ordered in stages.items():
+            res[stage] = {'count': counts[stage],
+                          'bytes': nbytes[stage],
+                          'p50': self.percentile(ordered, 50),
+                          'p95': self.percentile(ordered, 95),
+                          'p99': self.percentile(ordered, 99)}
+        return res
+
+    def report(self):
+        lines = ['%-12s %8s %12s %10s %10s %10s' % ('stage', 'count', 'bytes', 'p50 ms', 'p95 ms', 'p99 ms')]
+        for stage, row in sorted(self.summary().items()):
+            lines.append('%-12s %8d %12d %10.2f %10.2f %10.2f' % (stage, row['count'], row['bytes'],
+                                                                 row['p50'] * 1000, row['p95'] * 1000,
+                                                                 row['p99'] * 1000))
+        return '\n'.join(lines)
+
+
+ACRCLOUD_NO_INSTRUMENT = ACRCloudInstrument()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, asyncio
+import urllib.parse
+import concurrent.futures
+
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudPCMRingBuffer, ACRCloudStatusCode
+from acrcloud.async_recognizer import AsyncACRCloudRecognizer
+
+'''
+Broadcast monitoring of many PCM channels on a single asyncio event loop.
+
+Each channel reads raw PCM (16 bit, mono, 8000 Hz) from a source, keeps the latest
+window in a ring buffer and, every hop seconds, fingerprints that window on a bounded
+worker pool and identifies it through one shared keep-alive connection pool. Results
+are delivered as ACRCloudMonitorEvent objects, to a callback and/or through events().
+
+Example:
+    monitor = ChannelMonitor(config, window=10, hop=10, fingerprint_workers=4)
+    monitor.add_channel('radio-1', HTTPStreamSource('http://127.0.0.1:8000/radio-1.pcm'))
+    monitor.add_channel('radio-2', FileTailSource('/var/capture/radio-2.pcm'))
+
+    async def main():
+        asyncio.ensure_future(monitor.run())
+        async for event in monitor.events():
+            if event.result.is_match:
+                print(event.channel_id, event.start_seconds, event.result.top_match.title)
+
+    asyncio.run(main())
+'''
+
+
+class FileTailSource:
+    '''PCM appended to a growing file, read like "tail -f".'''
+
+    def __init__(self, path, chunk_size=16000, poll_interval=0.5, from_start=True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+
+    async def __aiter__(self):
+        with open(self.path, 'rb') as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            while True:
+                chunk = f.read(self.chunk_size)
+                if chunk:
+                    yield chunk
+                else:
+                    await asyncio.sleep(self.poll_interval)
+
+
+class PipeSource:
+    '''PCM written to a named pipe (FIFO) by a capture process; ends when the writer closes it.'''
+
+    def __init__(self, path, chunk_size=16000):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                                    os.fdopen(fd, 'rb', 0))
+        try:
+            while True:
+                chunk = await reader.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            transport.close()
+
+
+class HTTPStreamSource:
+    '''PCM served over a long-lived HTTP GET, as by an Icecast-style relay.'''
+
+    def __init__(self, url, chunk_size=16000, ssl_context=None):
+        self.url = url
+        self.chunk_size = chunk_size
+        self.ssl_context = ssl_context
+
+    async def __aiter__(self):
+        parts = urllib.parse.urlsplit(self.url)
+        if parts.scheme == 'https':
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 443,
+                                                           ssl=self.ssl_context or True)
+        else:
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        path = parts.path or '/'
+        if parts.query:
+            path = path + '?' + parts.query
+        try:
+            writer.write(('GET %s HTTP/1.0\r\nHost: %s\r\nIcy-MetaData: 0\r\n\r\n' %
+                          (path, parts.netloc)).encode('latin-1'))
+            await writer.drain()
+            status = await reader.readline()
+            if b' 200 ' not in status:
+                raise ConnectionError('%s: %s' % (self.url, status.decode('latin-1').strip()))
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            while True:
+                chunk = await reader.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            writer.close()
+
+
+class ACRCloudMonitorEvent:
+    __slots__ = ('channel_id', 'start_seconds', 'result')
+
+    def __init__(self, channel_id, start_seconds, result):
+        self.channel_id = channel_id
+        self.start_seconds = start_seconds
+        self.result = result
+
+    def __repr__(self):
+        return 'ACRCloudMonitorEvent(%r, %r, %r)' % (self.channel_id, self.start_seconds, self.result)
+
+
+class ChannelMonitor:
+    def __init__(self, config, window=10, hop=10, fingerprint_workers=4, on_event=None, matches_only=False,
+                 max_queued_events=10000):
+        self.recognizer = AsyncACRCloudRecognizer(config)
+        self.window = window
+        self.hop = hop
+        self.on_event = on_event
+        self.matches_only = matches_only
+        self.executor = concurrent.futures.ThreadPoolExecutor(fingerprint_workers)
+        self.channels = {}
+        self.errors = {}
+        self._queue = asyncio.Queue(max_queued_events)
+        self._identify_tasks = set()
+
+    def add_channel(self, channel_id, source):
+        '''source is any async iterable of PCM chunks, e.g. FileTailSource, PipeSource or HTTPStreamSource.'''
+        self.channels[channel_id] = source
+
+    async def run(self):
+        '''Monitor every channel until all sources are exhausted.'''
+        try:
+            await asyncio.gather(*[self._run_channel(channel_id, source)
+                                   for channel_id, source in self.channels.items()])
+            if self._identify_tasks:
+                await asyncio.gather(*list(self._identify_tasks))
+        finally:
+            self.executor.shutdown(wait=False)
+            await self.recognizer.close()
+            self._put(None)
+
+    async def events(self):
+        '''Yield ACRCloudMonitorEvent objects as they arrive, until run() finishes.'''
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                return
+            yield event
+
+    async def _run_channel(self, channel_id, source):
+        ring = ACRCloudPCMRingBuffer.for_windows(self.window, self.hop, ACRCloudRecognizer.PCM_BYTES_PER_SECOND)
+        loop = asyncio.get_running_loop()
+        recognizer = self.recognizer.recognizer
+        try:
+            async for chunk in source:
+                for start_seconds, pcm in ring.feed(chunk):
+                    # reading waits for the fingerprint, so the ring is not overwritten under it.
+                    try:
+                        query_data = await loop.run_in_executor(self.executor, recognizer.create_query_data_by_pcm,
+                                                                pcm)
+                    except Exception as e:
+                        await self._emit(channel_id, start_seconds, recognizer.error_result(
+                            ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), True))
+                    else:
+                        task = asyncio.ensure_future(self._identify(channel_id, start_seconds, query_data))
+                        self._identify_tasks.add(task)
+                        task.add_done_callback(self._identify_tasks.discard)
+        except Exception as e:
+            self.errors[channel_id] = e
+
+    async def _identify(self, channel_id, start_seconds, query_data):
+        re = self.recognizer
+        async with re.semaphore:
+            try:
+                res = await re.do_recogize(re.host, query_data, re.query_type, re.access_key, re.access_secret,
+                                           re.timeout)
+                res = re.recognizer.check_result(res, True)
+            except Exception as e:
+                res = re.recognizer.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), True)
+        await self._emit(channel_id, start_seconds, res)
+
+    async def _emit(self, channel_id, start_seconds, result):
+        if self.matches_only and not result.is_match:
+            return
+        event = ACRCloudMonitorEvent(channel_id, start_seconds, result)
+        if self.on_event is not None:
+            self.on_event(event)
+        self._put(event)
+
+    def _put(self, event):
+        if self._queue.full():
+            # nobody is draining events(); keep the newest ones.
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
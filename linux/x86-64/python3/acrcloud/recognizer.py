@@ -1,12 +1,37 @@
 #!/usr/bin/env python
 # -*- coding:utf-8 -*-
 
-import sys, time, json, base64, hmac, hashlib
+import os, sys, mmap, time, array, base64, hmac, hashlib, operator, threading
+import concurrent.futures
 import urllib.request
-import urllib.parse
+import urllib.error
 import datetime
 
-import acrcloud_extr_tool
+# transport, resilience, caching, instrumentation and result types live in their own
+# modules; everything is importable from here as well.
+from acrcloud.transport import (ACRCloudPoolExhausted, ACRCloudProxyRules, ACRCloudConnectionPool,
+                                ACRCloudRequestHandle, ACRCloudMultipartEncoder)
+from acrcloud.resilience import (ACRCloudDeadlineExceeded, ACRCloudDeadline, ACRCloudDeadlineThreads,
+                                 ACRCloudDeadlineProcesses, ACRCloudRetryBudget, ACRCloudRetryPolicy,
+                                 ACRCloudHedgePolicy, ACRCloudHostRouter, ACRCloudRateLimiter)
+from acrcloud.cache import ACRCloudFingerprintCache, ACRCloudResponseCache, ACRCloudSingleFlight
+from acrcloud.instrument import ACRCloudInstrument, ACRCloudStageStats, ACRCLOUD_NO_INSTRUMENT
+from acrcloud.result import (ACRCloudJson, ACRCloudStatusCode, ACRCloudScanSummary, ACRCloudMatch,
+                             ACRCloudRecognitionResult)
+
+# ACRCLOUD_EXTR_TOOL=stub selects the pure-Python stand-in (see use_extr_tool).
+if os.environ.get('ACRCLOUD_EXTR_TOOL') == 'stub':
+    from acrcloud.bench import extr_tool_stub as acrcloud_extr_tool
+else:
+    try:
+        import acrcloud_extr_tool
+    except ImportError:
+        acrcloud_extr_tool = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 '''
 Copyright 2015 ACRCloud Recognizer v1.0.10
@@ -33,17 +58,206 @@ Example:
 '''
 
 
+def use_extr_tool(tool='native', settings=None):
+    '''
+    Select the fingerprinting backend of this process: 'native' (acrcloud_extr_tool),
+    'stub' (acrcloud.bench.extr_tool_stub, pure Python, for benchmarks and CI) or a
+    module with the same functions. settings are passed to the stub's configure().
+    Every recognizer in the process uses the backend, so it is chosen here or with
+    ACRCLOUD_EXTR_TOOL, never from a recognizer's config.
+    '''
+    global acrcloud_extr_tool
+    if tool == 'stub':
+        from acrcloud.bench import extr_tool_stub as tool
+    elif tool == 'native':
+        import acrcloud_extr_tool as tool
+    if settings:
+        tool.configure(**settings)
+    acrcloud_extr_tool = tool
+    ACRCloudRecognizer.native_buffer_protocol = None
+    return tool
+
+
+def use_worker_extr_tool(worker_config):
+    # a worker process fingerprints with the backend of the process that started it.
+    if worker_config.get('extr_tool') is not None:
+        use_extr_tool(worker_config['extr_tool'], worker_config.get('extr_tool_settings'))
+
+
 class ACRCloudRecognizeType:
     ACR_OPT_REC_AUDIO = 0  # audio fingerprint
     ACR_OPT_REC_HUMMING = 1  # humming fingerprint
     ACR_OPT_REC_BOTH = 2  # audio and humming fingerprint
 
 
+class ACRCloudPCMRingBuffer:
+    '''
+    Preallocated ring holding the latest capacity bytes of a PCM stream.
+
+    Every byte is stored twice, at i and i + capacity, so the newest capacity bytes are
+    always one contiguous region: window() returns them as a memoryview with no copy.
+
+    feed() cuts a stream into windows of capacity bytes starting every hop bytes;
+    for_windows() builds a ring for that from seconds of 16 bit mono PCM.
+    '''
+
+    def __init__(self, capacity, hop=None, bytes_per_second=16000):
+        self.capacity = capacity
+        self.hop = hop or capacity
+        self.bytes_per_second = bytes_per_second
+        self.filled = 0
+        self.total = 0  # bytes written since creation
+        self._pos = 0
+        self._next_end = capacity  # total at which the next window completes
+        self._buf = bytearray(2 * capacity)
+        self._view = memoryview(self._buf)
+
+    @classmethod
+    def for_windows(cls, window, hop, bytes_per_second=16000):
+        # sizes are kept on sample boundaries (2 bytes per sample).
+        return cls(int(window * bytes_per_second) // 2 * 2, max(2, int(hop * bytes_per_second) // 2 * 2),
+                   bytes_per_second)
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self.total += len(data)
+        if len(data) > self.capacity:
+            data = data[-self.capacity:]
+        n = len(data)
+        cap = self.capacity
+        pos = self._pos
+        first = min(n, cap - pos)
+        view = self._view
+        view[pos:pos + first] = data[:first]
+        view[pos + cap:pos + cap + first] = data[:first]
+        rest = n - first
+        if rest:
+            view[0:rest] = data[first:]
+            view[cap:cap + rest] = data[first:]
+        self._pos = (pos + n) % cap
+        self.filled = min(cap, self.filled + n)
+
+    def window(self):
+        if self.filled < self.capacity:
+            return self._view[0:self.filled]
+        return self._view[self._pos:self._pos + self.capacity]
+
+    def feed(self, chunk):
+        '''
+        Write chunk, yielding (start_seconds, window()) for each window it completes,
+        start_seconds counted from the beginning of the stream. A window is a view of the
+        ring: use it before resuming the generator, which overwrites it.
+        '''
+        chunk = memoryview(chunk).cast('B')
+        offset = 0
+        while offset < len(chunk):
+            take = min(len(chunk) - offset, self._next_end - self.total)
+            self.write(chunk[offset:offset + take])
+            offset += take
+            if self.total == self._next_end:
+                start_seconds = (self._next_end - self.capacity) / self.bytes_per_second
+                if start_seconds.is_integer():
+                    start_seconds = int(start_seconds)
+                self._next_end += self.hop
+                yield start_seconds, self.window()
+
+
+class ACRCloudSilenceGate:
+    '''
+    RMS energy gate over 16 bit, 8000 Hz PCM, checked before fingerprinting so that
+    near-silent windows never reach acrcloud_extr_tool or the network.
+
+    The window is cut into frames of frame_ms; a frame whose RMS is below
+    energy_threshold is silent. The window is skipped when the share of silent frames
+    reaches rate_threshold, or when the RMS of the whole window is below energy_min.
+    NumPy is used when installed, the array module otherwise. windows, skipped_windows
+    and skipped_bytes count gate activity.
+    '''
+
+    def __init__(self, energy_threshold=100, rate_threshold=1, energy_min=0, frame_ms=100):
+        self.energy_threshold = energy_threshold
+        self.rate_threshold = rate_threshold
+        self.energy_min = energy_min
+        self.frame_samples = max(1, int(frame_ms * 8))
+        self.windows = 0
+        self.skipped_windows = 0
+        self.skipped_bytes = 0
+        self._lock = threading.Lock()
+
+    def is_silent(self, pcm):
+        pcm = memoryview(pcm).cast('B')
+        pcm = pcm[:len(pcm) // 2 * 2]
+        if not pcm:
+            return False
+        frames, silent_frames, window_energy = self.measure(pcm)
+        silent = (silent_frames >= self.rate_threshold * frames or
+                  window_energy < self.energy_min * self.energy_min)
+        with self._lock:
+            self.windows += 1
+            if silent:
+                self.skipped_windows += 1
+                self.skipped_bytes += len(pcm)
+        return silent
+
+    def measure(self, pcm):
+        '''Returns (frames, silent frames, mean square of the whole window).'''
+        threshold = self.energy_threshold * self.energy_threshold
+        size = self.frame_samples
+        if numpy is not None:
+            samples = numpy.frombuffer(pcm, dtype='<i2').astype(numpy.float64)
+            squares = samples * samples
+            starts = numpy.arange(0, len(squares), size)
+            counts = numpy.diff(numpy.append(starts, len(squares)))
+            frame_energy = numpy.add.reduceat(squares, starts) / counts
+            return len(starts), int(numpy.count_nonzero(frame_energy < threshold)), squares.sum() / len(squares)
+
+        samples = array.array('h')
+        samples.frombytes(pcm)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        frames = silent_frames = total = 0
+        for start in range(0, len(samples), size):
+            frame = samples[start:start + size]
+            energy = sum(map(operator.mul, frame, frame))
+            total += energy
+            frames += 1
+            if energy < threshold * len(frame):
+                silent_frames += 1
+        return frames, silent_frames, total / float(len(samples))
+
+    def stats(self):
+        with self._lock:
+            return {'windows': self.windows, 'skipped_windows': self.skipped_windows,
+                    'skipped_bytes': self.skipped_bytes}
+
+
 class ACRCloudRecognizer:
+    PCM_BYTES_PER_SECOND = 16000  # 16 bit, mono, 8000 Hz
+
+    # whether acrcloud_extr_tool takes any buffer-protocol object or only bytes;
+    # probed once per backend, on the first non-bytes call (see call_native).
+    native_buffer_protocol = None
+
+    # options a worker process needs to create fingerprints; everything else stays in the parent.
+    WORKER_CONFIG_KEYS = ('recognize_type', 'filter_energy_min', 'silence_energy_threshold',
+                          'silence_rate_threshold', 'silence_gate', 'silence_gate_frame_ms', 'debug',
+                          'fingerprint_cache_size', 'fingerprint_cache_path')
+
     def __init__(self, config):
         self.config = config
         self.ii = 1
+        if acrcloud_extr_tool is None:
+            raise ImportError("acrcloud_extr_tool is not installed (call use_extr_tool('stub') or set "
+                              "ACRCLOUD_EXTR_TOOL=stub to run without it)")
         self.host = config.get('host', 'ap-southeast-1.api.acrcloud.com')
+        # hosts: equivalent identify hosts to route between (see ACRCloudHostRouter).
+        self.host_router = config.get('host_router')
+        if self.host_router is None and config.get('hosts'):
+            self.host_router = ACRCloudHostRouter(config['hosts'], config.get('host_ewma_alpha', 0.3),
+                                                  config.get('host_failure_threshold', 3),
+                                                  config.get('host_open_seconds', 10))
+        if self.host_router is not None and 'host' not in config:
+            self.host = self.host_router.hosts[0]
         self.endpoint = config.get('endpoint', '/v1/identify')
         self.query_type = config.get('query_type', 'fingerprint')
         self.access_key = config.get('access_key')
@@ -61,54 +275,326 @@ class ACRCloudRecognizer:
         self.silence_energy_threshold = config.get('silence_energy_threshold', 100)
         self.silence_rate_threshold = config.get('silence_rate_threshold', 1)
 
+        # silence_gate: True, or an ACRCloudSilenceGate to share its counters.
+        self.silence_gate = config.get('silence_gate') or None
+        if self.silence_gate is True:
+            self.silence_gate = ACRCloudSilenceGate(self.silence_energy_threshold, self.silence_rate_threshold,
+                                                    self.filter_energy_min, config.get('silence_gate_frame_ms', 100))
+
+        self.ssl_context = config.get('ssl_context')
+        self.pool = config.get('connection_pool')
+        self._own_pool = False
+        if self.pool is None and config.get('keep_alive', True):
+            self.pool = ACRCloudConnectionPool(config.get('pool_max_per_host', 4),
+                                               config.get('pool_idle_timeout', 30),
+                                               self.ssl_context)
+            self._own_pool = True
+
+        self.fingerprint_cache = config.get('fingerprint_cache')
+        if self.fingerprint_cache is None and (config.get('fingerprint_cache_size') or
+                                               config.get('fingerprint_cache_path')):
+            self.fingerprint_cache = ACRCloudFingerprintCache(config.get('fingerprint_cache_size', 64 << 20),
+                                                              config.get('fingerprint_cache_path'))
+
+        self.response_cache = config.get('response_cache')
+        if self.response_cache is None and config.get('response_cache_size'):
+            self.response_cache = ACRCloudResponseCache(config['response_cache_size'],
+                                                        config.get('response_cache_ttl', 300),
+                                                        config.get('response_cache_no_result_ttl', 30))
+
+        # ACR_OPT_REC_BOTH: the humming fingerprint is created on this executor while the
+        # audio fingerprint is created on the calling thread. 'thread' (default) suits a
+        # native module that releases the GIL, 'process' one that does not; None (or
+        # 'none') keeps both on the calling thread. An Executor instance is used as is.
+        self.fingerprint_executor = None
+        self._own_executor = False
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            executor = config.get('fingerprint_executor', 'thread')
+            if executor == 'thread':
+                self.fingerprint_executor = concurrent.futures.ThreadPoolExecutor(1)
+                self._own_executor = True
+            elif executor == 'process':
+                self.fingerprint_executor = concurrent.futures.ProcessPoolExecutor(1)
+                self._own_executor = True
+            elif executor not in (None, 'none'):
+                self.fingerprint_executor = executor
+
+        self.retry_policy = config.get('retry_policy')
+        if self.retry_policy is None and config.get('retry_max_attempts', 1) > 1:
+            self.retry_policy = ACRCloudRetryPolicy(config['retry_max_attempts'],
+                                                    config.get('retry_backoff_base', 0.1),
+                                                    config.get('retry_backoff_max', 2.0),
+                                                    config.get('retry_statuses', ACRCloudRetryPolicy.RETRY_STATUSES),
+                                                    config.get('retry_codes', ()),
+                                                    config.get('retry_budget'))
+
+        # every identify request (retries included) takes a token; see ACRCloudRateLimiter.
+        # rate_limit_timeout: None waits for a token, 0 never waits, otherwise the most
+        # seconds to wait. Requests that get no token return RATE_LIMIT_ERROR_CODE.
+        self.rate_limiter = config.get('rate_limiter')
+        if self.rate_limiter is None and config.get('rate_limit'):
+            self.rate_limiter = ACRCloudRateLimiter.get(config['rate_limit'], config.get('rate_limit_burst'),
+                                                        config.get('rate_limit_path'))
+        self.rate_limit_timeout = config.get('rate_limit_timeout')
+
+        # hedged requests need the connection pool, whose requests can be aborted; the
+        # blocking client sends the hedges from hedge_workers threads.
+        self.hedge_policy = ACRCloudHedgePolicy.from_config(config)
+        self.hedge_executor = None
+        if self.hedge_policy is not None:
+            if self.pool is None:
+                raise ValueError('hedging needs keep_alive: a losing request could not be aborted')
+            self.hedge_executor = concurrent.futures.ThreadPoolExecutor(config.get('hedge_workers', 16))
+
+        # single_flight: True, or an ACRCloudSingleFlight shared with other recognizers.
+        self.single_flight = config.get('single_flight') or None
+        if self.single_flight is True:
+            self.single_flight = ACRCloudSingleFlight()
+
+        # calls given a deadline decode and fingerprint on at most deadline_workers workers,
+        # so the caller can return at the deadline. With deadline_executor 'thread' (default)
+        # a native call can not be interrupted: its thread is abandoned, stops at the next
+        # stage boundary and its result is dropped. With 'process' the worker process is killed.
+        self.deadline_threads = ACRCloudDeadlineThreads(config.get('deadline_workers', 4))
+        self.deadline_local = threading.local()
+        self.deadline_processes = None
+        if config.get('deadline_executor') == 'process':
+            self.deadline_processes = ACRCloudDeadlineProcesses(self.worker_config(config),
+                                                                config.get('deadline_workers', 4))
+
+        self.instrument = config.get('instrument') or ACRCLOUD_NO_INSTRUMENT
+        self.json = ACRCloudJson.get(config.get('json_backend', 'auto'))
+
         if self.debug:
             acrcloud_extr_tool.set_debug()
 
+    def stage_start(self):
+        return time.monotonic() if self.instrument.enabled else 0.0
+
+    def stage_end(self, stage, started, nbytes=0):
+        if self.instrument.enabled:
+            self.instrument.record(stage, time.monotonic() - started, nbytes)
+
     def post_multipart(self, url, fields, files, timeout):
-        content_type, body = self.encode_multipart_formdata(fields, files)
+        try:
+            return self.post_multipart_attempt(url, fields, files, timeout)[0]
+        except ACRCloudPoolExhausted as e:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e))
 
-        if not content_type and not body:
+    def post_multipart_attempt(self, url, fields, files, timeout, handle=None):
+        '''
+        POST the identify request once. Returns (res, retryable): retryable is True for
+        network errors and for HTTP statuses in the retry policy's retry_statuses (or
+        ACRCloudRetryPolicy.RETRY_STATUSES without a policy). ACRCloudPoolExhausted is
+        raised when no pooled connection came free within timeout.
+        '''
+        started = self.stage_start()
+        try:
+            body = ACRCloudMultipartEncoder(fields, files)
+        except Exception as e:
+            print('encode_multipart_formdata error' + str(e))
             return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
-                                                       'encode_multipart_formdata error')
+                                                       'encode_multipart_formdata error'), False
+        self.stage_end('encode', started, body.content_length)
 
+        headers = {'Content-Type': body.content_type,
+                   'Content-Length': str(body.content_length),
+                   'Referer': url}
         try:
-            req = urllib.request.Request(url, data=body)
-            req.add_header('Content-Type', content_type)
-            req.add_header('Referer', url)
-            resp = urllib.request.urlopen(req, timeout=timeout)
-            ares = resp.read().decode('utf8')
-            return ares
+            started = self.stage_start()
+            if self.pool is not None and not self.pool.proxied(url):
+                status, reason, data = self.pool.request('POST', url, body, headers, timeout, handle)
+                self.stage_end('network', started, body.content_length + len(data))
+                if status >= 400:
+                    return (ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
+                                                                'HTTP Error %d: %s' % (status, reason)),
+                            self.retryable_status(status))
+                return data.decode('utf8'), False
+            req = urllib.request.Request(url, data=body, headers=headers)
+            resp = urllib.request.urlopen(req, timeout=timeout, context=self.ssl_context)
+            ares = resp.read()
+            self.stage_end('network', started, body.content_length + len(ares))
+            return ares.decode('utf8'), False
+        except ACRCloudPoolExhausted:
+            raise
+        except urllib.error.HTTPError as e:
+            return (ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e)),
+                    self.retryable_status(e.code))
         except Exception as e:
-            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e))
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e)), True
+
+    def send_to(self, target, query_data, query_type, access_key, access_secret, timeout, user_params,
+                handle=None):
+        '''One identify request to target. Returns (res, retryable) like post_multipart_attempt.'''
+        recorded = False
+        try:
+            # signed again on every attempt: the signature covers the timestamp.
+            server_url, fields = self.sign_request(target, query_data, query_type, access_key, access_secret,
+                                                   user_params)
+            if server_url is None:
+                return fields, False
+            started = time.monotonic()
+            try:
+                res, retryable = self.post_multipart_attempt(server_url, fields, query_data, timeout, handle)
+            except ACRCloudPoolExhausted as e:
+                # the request never left this client: worth retrying, but no news about target.
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e)), True
+            elapsed = time.monotonic() - started
+            if handle is not None and handle.cancelled:
+                return res, retryable
+            self.record_host(target, elapsed, retryable)
+            recorded = True
+            if self.hedge_policy is not None and not retryable:
+                self.hedge_policy.record(elapsed)
+            return res, retryable
+        finally:
+            if not recorded:
+                self.abandon_host(target)
+
+    def send_hedged(self, host, tried, query_data, query_type, access_key, access_secret, timeout, user_params):
+        '''
+        send_to on the calling thread, plus a duplicate request (to the next routed host,
+        if any) from a hedge_workers thread when the first is slower than the hedge delay.
+        The first good response wins and the other request is aborted by shutting down
+        its connection. Requests through a proxy are not hedged, as urllib can not abort them.
+        '''
+        args = (query_data, query_type, access_key, access_secret, timeout, user_params)
+        policy = self.hedge_policy
+        delay = policy.delay()
+        target = self.route(host, tried)
+        if delay is None or self.pool.proxied('https://' + target):
+            return self.send_to(target, *args)
+        first_handle, hedge_handle = ACRCloudRequestHandle(), ACRCloudRequestHandle()
+        first_done = threading.Event()
+        # the hedge waits out the delay on the executor, so a busy executor can only make
+        # a hedge late, never send one because the first request was kept waiting.
+        hedge = self.hedge_executor.submit(self.send_hedge, first_done, time.monotonic() + delay, host, tried,
+                                           first_handle, hedge_handle, args)
+        try:
+            res, retryable = self.send_to(target, *args, handle=first_handle)
+        finally:
+            first_done.set()
+        if not retryable and not first_handle.cancelled:
+            hedge.cancel()
+            hedge_handle.cancel()
+            return res, retryable
+        hedged = None if hedge.cancel() else hedge.result()
+        if hedged is None or hedged[1]:
+            # no hedge was sent, or it failed as well.
+            return res, retryable
+        policy.won()
+        return hedged
+
+    def send_hedge(self, first_done, hedge_at, host, tried, first_handle, hedge_handle, args):
+        # the duplicate request of send_hedged, or None when it was not sent.
+        if first_done.wait(max(0.0, hedge_at - time.monotonic())):
+            return None
+        # a hedge is an identify request too: it needs a rate limit token, without waiting.
+        if ((self.rate_limiter is not None and not self.rate_limiter.acquire(False)) or
+                not self.hedge_policy.allow_hedge()):
+            return None
+        res, retryable = self.send_to(self.route(host, tried), *args, handle=hedge_handle)
+        if not retryable:
+            first_handle.cancel()
+        return res, retryable
+
+    def acquire_rate_limit(self, deadline=None):
+        timeout = self.rate_limit_timeout
+        if deadline is not None and timeout != 0:
+            timeout = deadline.timeout(timeout)
+            return self.rate_limiter.acquire(timeout > 0, timeout)
+        return self.rate_limiter.acquire(timeout != 0, timeout or None)
+
+    def route(self, host, tried):
+        '''The host for the next attempt: host itself unless it is the router's default.'''
+        if self.host_router is None or host != self.host:
+            return host
+        # each attempt of a request goes to a host it has not tried yet, while there is one.
+        target = self.host_router.choose(tried if len(tried) < len(self.host_router.hosts) else ())
+        tried.append(target)
+        return target
+
+    def record_host(self, host, seconds, failed):
+        if self.host_router is not None:
+            self.host_router.record(host, seconds, not failed)
+
+    def abandon_host(self, host):
+        # a request that was refused, cancelled or aborted says nothing about host, but it
+        # must not keep holding a half-open probe slot.
+        if self.host_router is not None:
+            self.host_router.abandon(host)
+
+    def retry_delay(self, attempt, retryable, deadline=None):
+        '''
+        Seconds to wait before another attempt, or None to stop. The retry policy decides
+        when there is one; otherwise a failed request moves on to the next routed host
+        once per configured host. No attempt is started that the deadline would cut off
+        before it is sent.
+        '''
+        if not retryable or (deadline is not None and deadline.expired()):
+            return None
+        if self.retry_policy is not None:
+            if deadline is not None:
+                backoff = self.retry_policy.backoff(attempt)
+                if backoff >= deadline.remaining() or not self.retry_policy.allow_retry(attempt):
+                    return None
+                return backoff
+            if self.retry_policy.allow_retry(attempt):
+                return self.retry_policy.backoff(attempt)
+            return None
+        if self.host_router is not None and attempt < len(self.host_router.hosts):
+            return 0
+        return None
+
+    def retryable_status(self, status):
+        if self.retry_policy is None:
+            return status in ACRCloudRetryPolicy.RETRY_STATUSES
+        return status in self.retry_policy.retry_statuses
+
+    def retryable_result(self, res):
+        '''Whether a response body carries one of the retry policy's retry_codes.'''
+        if self.retry_policy is None or not self.retry_policy.retry_codes:
+            return False
+        try:
+            return self.json.loads(res)['status']['code'] in self.retry_policy.retry_codes
+        except Exception:
+            return False
+
+    def annotate_attempts(self, res, attempts):
+        # "attempts" is only added when the request was retried.
+        if attempts < 2:
+            return res
+        try:
+            tree = self.json.loads(res)
+            tree['attempts'] = attempts
+            return self.json.dumps(tree)
+        except Exception:
+            return res
+
+    def close(self):
+        if self._own_pool:
+            self.pool.close()
+        if self._own_executor:
+            self.fingerprint_executor.shutdown()
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown()
+        if self.deadline_processes is not None:
+            self.deadline_processes.close()
 
     def encode_multipart_formdata(self, fields, files):
         try:
-            boundary = "*****2016.05.27.acrcloud.rec.copyright." + str(time.time()) + "*****"
-            CRLF = '\r\n'
-            L = []
-            for (key, value) in list(fields.items()):
-                L.append('--' + boundary)
-                L.append('Content-Disposition: form-data; name="%s"' % key)
-                L.append('')
-                L.append(value)
-
-            body = bytes(CRLF.join(L), encoding='utf-8')
-
-            for (key, value) in list(files.items()):
-                L = []
-                L.append(CRLF + '--' + boundary)
-                L.append('Content-Disposition: form-data; name="%s"; filename="%s"' % (key, key))
-                L.append('Content-Type: application/octet-stream')
-                L.append(CRLF)
-                body = body + CRLF.join(L).encode('ascii') + value
-            body = body + (CRLF + '--' + boundary + '--' + CRLF + CRLF).encode('ascii')
-            content_type = 'multipart/form-data; boundary=%s' % boundary
-            return content_type, body
+            body = ACRCloudMultipartEncoder(fields, files)
+            return body.content_type, body.to_bytes()
         except Exception as e:
             print('encode_multipart_formdata error' + str(e))
         return None, None
 
-    def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5, user_params=None):
+    def sign_request(self, host, query_data, query_type, access_key, access_secret, user_params=None):
+        '''
+        Build the signed identify request for query_data.
+        Returns (server_url, fields), or (None, error_result) when query_data can not be sent.
+        '''
+        started = self.stage_start()
         http_method = "POST"
         http_url_file = self.endpoint
         data_type = query_type
@@ -136,142 +622,660 @@ class ACRCloudRecognizer:
         sample_bytes = 0
         if 'sample' in query_data:
             if query_data['sample'] is None:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
             sample_bytes = len(query_data['sample'])
             if sample_bytes == 0:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.GEN_FINGERPRINT_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.GEN_FINGERPRINT_ERROR_CODE)
             fields['sample_bytes'] = str(sample_bytes)
 
         if 'sample_hum' in query_data:
             if query_data['sample_hum'] is None:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
             sample_hum_bytes = len(query_data['sample_hum'])
             if sample_bytes == 0 and sample_hum_bytes == 0:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.GEN_FINGERPRINT_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.GEN_FINGERPRINT_ERROR_CODE)
             fields['sample_hum_bytes'] = str(sample_hum_bytes)
 
         server_url = 'https://' + host + http_url_file
-        res = self.post_multipart(server_url, fields, query_data, timeout)
+        self.stage_end('sign', started)
+        return server_url, fields
+
+    def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5, user_params=None,
+                    deadline=None):
+        cache_key = self.response_cache_key(host, query_data, query_type, access_key, user_params)
+        if cache_key is not None:
+            res = self.response_cache.get(cache_key)
+            if res is not None:
+                return res
+
+        flight_key = self.single_flight_key(cache_key, host, query_data, query_type, access_key, user_params)
+        if flight_key is not None:
+            try:
+                res = self.single_flight.do(flight_key, self.send_identify, host, query_data, query_type, access_key,
+                                            access_secret, timeout, user_params, deadline,
+                                            timeout=deadline.remaining() if deadline is not None else None)
+            except TimeoutError:
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+        else:
+            res = self.send_identify(host, query_data, query_type, access_key, access_secret, timeout, user_params,
+                                     deadline)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, res, self.json)
         return res
 
-    def recognize_audio(self, file_path, start_seconds=0, rec_length=10, user_params=None, audio_type=1):
+    def send_identify(self, host, query_data, query_type, access_key, access_secret, timeout, user_params,
+                      deadline=None):
+        if self.retry_policy is not None:
+            self.retry_policy.budget.deposit()
+        tried = []
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None and not self.acquire_rate_limit(deadline):
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.RATE_LIMIT_ERROR_CODE)
+            if deadline is not None and deadline.expired():
+                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+            attempt_timeout = deadline.timeout(timeout) if deadline is not None else timeout
+            if self.hedge_executor is not None:
+                res, retryable = self.send_hedged(host, tried, query_data, query_type, access_key, access_secret,
+                                                  attempt_timeout, user_params)
+            else:
+                res, retryable = self.send_to(self.route(host, tried), query_data, query_type, access_key,
+                                              access_secret, attempt_timeout, user_params)
+            delay = self.retry_delay(attempt, retryable or self.retryable_result(res), deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+        if retryable and deadline is not None and deadline.expired():
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.TIMEOUT_ERROR_CODE)
+        return self.annotate_attempts(res, attempt)
+
+    def single_flight_key(self, cache_key, host, query_data, query_type, access_key, user_params):
+        # the payload digest, endpoint and parameters, as for the response cache.
+        if self.single_flight is None:
+            return None
+        if cache_key is not None:
+            return cache_key
+        return ACRCloudResponseCache.key(host, self.endpoint, query_type, access_key, query_data, user_params)
+
+    def response_cache_key(self, host, query_data, query_type, access_key, user_params=None):
+        if self.response_cache is None:
+            return None
+        return self.response_cache.key(host, self.endpoint, query_type, access_key, query_data, user_params)
+
+    def check_result(self, res, parse=False):
+        '''
+        Validate a response. Returns it unchanged (or a JSON error result) as a string, or
+        with parse=True as an ACRCloudRecognitionResult built from the same single parse.
+        '''
+        started = self.stage_start()
+        try:
+            tree = self.json.loads(res)
+        except Exception as e:
+            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+            tree = self.json.loads(res)
+        self.stage_end('parse', started, len(res))
+        if parse:
+            return ACRCloudRecognitionResult(tree, res, self.json)
+        return res
+
+    def error_result(self, res_code, msg='', parse=False):
+        res = ACRCloudStatusCode.get_result_error(res_code, msg)
+        if parse:
+            return ACRCloudRecognitionResult(self.json.loads(res), res, self.json)
+        return res
+
+    def audio_fingerprint_opt(self):
+        return {
+            'filter_energy_min': self.filter_energy_min,
+            'silence_energy_threshold': self.silence_energy_threshold,
+            'silence_rate_threshold': self.silence_rate_threshold
+        }
+
+    def create_query_data_by_file(self, file_path, start_seconds, rec_length=10):
+        cache = self.fingerprint_cache
+        if cache is None:
+            return self.fingerprint_file(file_path, start_seconds, rec_length)
+        key = cache.key(acrcloud_extr_tool.version(), cache.file_digest(file_path), start_seconds, rec_length,
+                        self.recognize_type, self.audio_fingerprint_opt())
+        query_data = cache.get(key)
+        if query_data is None:
+            query_data = self.fingerprint_file(file_path, start_seconds, rec_length)
+            cache.put(key, query_data)
+        return query_data
+
+    def create_query_data_by_filebuffer(self, file_buffer, start_seconds, rec_length=10):
+        cache = self.fingerprint_cache
+        if cache is None:
+            return self.fingerprint_filebuffer(file_buffer, start_seconds, rec_length)
+        key = cache.key(acrcloud_extr_tool.version(), cache.buffer_digest(file_buffer), start_seconds, rec_length,
+                        self.recognize_type, self.audio_fingerprint_opt())
+        query_data = cache.get(key)
+        if query_data is None:
+            query_data = self.fingerprint_filebuffer(file_buffer, start_seconds, rec_length)
+            cache.put(key, query_data)
+        return query_data
+
+    def create_query_data_by_mmap(self, file_path, start_seconds, rec_length=10):
+        '''create_query_data_by_filebuffer over a read-only memory map of file_path.'''
+        cache = self.fingerprint_cache
+        if cache is not None:
+            # hashed in chunks by path, not through the map, so the cache check does not
+            # fault in the whole file.
+            key = cache.key(acrcloud_extr_tool.version(), cache.file_digest(file_path), start_seconds, rec_length,
+                            self.recognize_type, self.audio_fingerprint_opt())
+            query_data = cache.get(key)
+            if query_data is not None:
+                return query_data
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return self.empty_query_data(None)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as file_buffer:
+                query_data = self.fingerprint_filebuffer(file_buffer, start_seconds, rec_length)
+        if cache is not None:
+            cache.put(key, query_data)
+        return query_data
+
+    def fingerprint_file(self, file_path, start_seconds, rec_length=10):
+        if self.silence_gate is not None or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            return self.fingerprint_decoded(acrcloud_extr_tool.decode_audio_by_file, file_path, start_seconds,
+                                            rec_length)
+        started = self.stage_start()
+        query_data = {}
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_file(file_path, start_seconds,
+                                                                                 rec_length, False,
+                                                                                 self.audio_fingerprint_opt())
+            self.check_deadline()
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_file(file_path,
+                                                                                             start_seconds,
+                                                                                             rec_length, 2)
+        self.stage_end('fingerprint', started, self.query_data_bytes(query_data))
+        return query_data
+
+    def fingerprint_filebuffer(self, file_buffer, start_seconds, rec_length=10):
+        if self.silence_gate is not None or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            return self.fingerprint_decoded(acrcloud_extr_tool.decode_audio_by_filebuffer, file_buffer,
+                                            start_seconds, rec_length)
+        started = self.stage_start()
+        query_data = {}
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample'] = self.call_native(acrcloud_extr_tool.create_fingerprint_by_filebuffer, file_buffer,
+                                                    start_seconds, rec_length, False, self.audio_fingerprint_opt())
+            self.check_deadline()
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample_hum'] = self.call_native(acrcloud_extr_tool.create_humming_fingerprint_by_filebuffer,
+                                                        file_buffer, start_seconds, rec_length, 2)
+        self.stage_end('fingerprint', started, self.query_data_bytes(query_data))
+        return query_data
+
+    def fingerprint_decoded(self, decode, source, start_seconds, rec_length):
+        # the silence gate needs the PCM, and BOTH mode makes two fingerprints of it:
+        # decode the window once here and fingerprint that PCM.
+        started = self.stage_start()
+        pcm = self.call_native(decode, source, start_seconds, rec_length)
+        self.stage_end('decode', started, len(pcm or b''))
+        if not pcm:
+            return self.empty_query_data(None)
+        self.check_deadline()
+        return self.create_query_data_by_pcm(pcm)
+
+    def empty_query_data(self, value=b''):
+        '''
+        query_data without fingerprints: sign_request answers GEN_FINGERPRINT_ERROR_CODE
+        for b'' (e.g. silence) and DECODE_ERROR_CODE for None, without any request.
+        '''
+        query_data = {}
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample'] = value
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample_hum'] = value
+        return query_data
+
+    def create_query_data_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10):
+        started = self.stage_start()
+        query_data = {}
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_fpbuffer(fp_buffer, start_seconds,
+                                                                                     rec_length)
+        self.stage_end('fingerprint', started, self.query_data_bytes(query_data))
+        return query_data
+
+    def create_query_data_by_pcm(self, pcm_buffer):
+        if self.silence_gate is not None and self.silence_gate.is_silent(pcm_buffer):
+            return self.empty_query_data()
+        started = self.stage_start()
+        query_data = {}
+        humming = None
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH and
+                self.fingerprint_executor is not None):
+            if isinstance(self.fingerprint_executor, concurrent.futures.ProcessPoolExecutor):
+                humming = self.fingerprint_executor.submit(self.humming_fingerprint, bytes(pcm_buffer))
+            else:
+                humming = self.fingerprint_executor.submit(self.humming_fingerprint, pcm_buffer)
+        if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample'] = self.call_native(acrcloud_extr_tool.create_fingerprint, pcm_buffer, False,
+                                                    self.audio_fingerprint_opt())
+            self.check_deadline()
+        if humming is not None:
+            query_data['sample_hum'] = humming.result()
+        elif (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
+                self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
+            query_data['sample_hum'] = self.humming_fingerprint(pcm_buffer)
+        self.stage_end('fingerprint', started, self.query_data_bytes(query_data))
+        return query_data
+
+    def create_query_data_audio(self, file_path, start_seconds=0, rec_length=10, audio_type=1):
+        started = self.stage_start()
+        if audio_type != 0:
+            audio_type = 1
+        query_data = {
+            'sample': acrcloud_extr_tool.decode_audio_by_file(file_path, start_seconds, rec_length, 8000,
+                                                              audio_type)
+        }
+        self.stage_end('decode', started, self.query_data_bytes(query_data))
+        return query_data
+
+    def create_query_data_audio_buffer(self, file_buffer, start_seconds=0, rec_length=10, audio_type=1):
+        started = self.stage_start()
+        if audio_type != 0:
+            audio_type = 1
+        query_data = {
+            'sample': self.call_native(acrcloud_extr_tool.decode_audio_by_filebuffer, file_buffer, start_seconds,
+                                       rec_length, 8000, audio_type)
+        }
+        self.stage_end('decode', started, self.query_data_bytes(query_data))
+        return query_data
+
+    @classmethod
+    def call_native(cls, func, buffer, *args):
+        '''
+        Call an acrcloud_extr_tool function whose first argument is audio data, passing
+        memoryviews / bytearrays / mmaps through untouched when the module accepts them
+        and copying them to bytes only for builds that insist on bytes. File paths are
+        passed as they are.
+        '''
+        if isinstance(buffer, (bytes, str)):
+            return func(buffer, *args)
+        if cls.native_buffer_protocol is None:
+            ACRCloudRecognizer.native_buffer_protocol = cls.probe_buffer_protocol()
+        if cls.native_buffer_protocol:
+            return func(buffer, *args)
+        return func(bytes(buffer), *args)
+
+    @staticmethod
+    def probe_buffer_protocol():
+        # a TypeError from the call itself could be anything; the argument parser of a
+        # bytes-only build rejects a memoryview of 0.1 seconds of silence just the same.
+        try:
+            acrcloud_extr_tool.create_fingerprint(memoryview(bytes(1600)), False)
+        except TypeError:
+            return False
+        return True
+
+    @classmethod
+    def humming_fingerprint(cls, pcm_buffer):
+        return cls.call_native(acrcloud_extr_tool.create_humming_fingerprint, pcm_buffer)
+
+    @staticmethod
+    def query_data_bytes(query_data):
+        return sum(len(value) for value in query_data.values() if value is not None)
+
+    @classmethod
+    def worker_config(cls, config):
+        worker_config = dict((k, config[k]) for k in cls.WORKER_CONFIG_KEYS if k in config)
+        worker_config.update(access_key='worker', access_secret='worker', keep_alive=False)
+        if worker_config.get('silence_gate'):
+            # a gate object (and its lock) can not be sent to the workers; each gets its own.
+            worker_config['silence_gate'] = True
+        if acrcloud_extr_tool is not None and acrcloud_extr_tool.version() == 'stub':
+            # read by use_worker_extr_tool: spawned workers would otherwise load the native module.
+            worker_config.update(extr_tool='stub', extr_tool_settings=acrcloud_extr_tool.settings())
+        return worker_config
+
+    def within_deadline(self, deadline, func, *args):
+        '''
+        func(*args), or with a deadline, func(*args) on a deadline worker that the caller
+        waits for until the deadline only (then ACRCloudDeadlineExceeded is raised). In
+        process mode func must be a create_query_data_* method of this recognizer.
+        '''
+        if deadline is None:
+            return func(*args)
+        if self.deadline_processes is not None:
+            # memoryviews and maps can not be pickled; a worker gets a copy of their bytes.
+            args = [bytes(arg) if isinstance(arg, (memoryview, mmap.mmap)) else arg for arg in args]
+            return self.deadline_processes.call(deadline, func.__name__, *args)
+        return self.deadline_threads.call(deadline, self.call_with_deadline, deadline, func, *args)
+
+    def call_with_deadline(self, deadline, func, *args):
+        # check_deadline() at the stage boundaries inside func finds the deadline here.
+        deadline.check()
+        self.deadline_local.deadline = deadline
+        try:
+            return func(*args)
+        finally:
+            self.deadline_local.deadline = None
+
+    def check_deadline(self):
+        deadline = getattr(self.deadline_local, 'deadline', None)
+        if deadline is not None:
+            deadline.check()
+
+    def recognize_audio(self, file_path, start_seconds=0, rec_length=10, user_params=None, audio_type=1, parse=False,
+                        deadline=None):
         if user_params is None:
             user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
         try:
-            if audio_type != 0:
-                audio_type = 1
-            query_data = {
-                'sample': acrcloud_extr_tool.decode_audio_by_file(file_path, start_seconds, rec_length, 8000,
-                                                                  audio_type)
-            }
+            query_data = self.within_deadline(deadline, self.create_query_data_audio,
+                                              file_path, start_seconds, rec_length, audio_type)
             if not query_data['sample'] or len(query_data['sample']) < 16000:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return self.error_result(ACRCloudStatusCode.DECODE_ERROR_CODE, '', parse)
             res = self.do_recogize(self.host, query_data, 'audio', self.access_key,
-                                   self.access_secret, self.timeout, user_params)
+                                   self.access_secret, self.timeout, user_params, deadline)
+            if parse:
+                res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
         return res
 
-    def recognize_audio_buffer(self, file_buffer, start_seconds=0, rec_length=10, user_params=None, audio_type=1):
+    def recognize_audio_buffer(self, file_buffer, start_seconds=0, rec_length=10, user_params=None, audio_type=1,
+                               parse=False, deadline=None):
         if user_params is None:
             user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
         try:
-            if audio_type != 0:
-                audio_type = 1
-            query_data = {
-                'sample': acrcloud_extr_tool.decode_audio_by_filebuffer(file_buffer, start_seconds,
-                                                                        rec_length, 8000, audio_type)
-            }
+            query_data = self.within_deadline(deadline, self.create_query_data_audio_buffer,
+                                              file_buffer, start_seconds, rec_length, audio_type)
             if not query_data['sample'] or len(query_data['sample']) < 16000:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return self.error_result(ACRCloudStatusCode.DECODE_ERROR_CODE, '', parse)
             res = self.do_recogize(self.host, query_data, 'audio', self.access_key,
-                                   self.access_secret, self.timeout, user_params)
+                                   self.access_secret, self.timeout, user_params, deadline)
+            if parse:
+                res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
         return res
 
-    def recognize_by_file(self, file_path, start_seconds, rec_length=10, user_params=None):
+    def recognize_by_file(self, file_path, start_seconds, rec_length=10, user_params=None, parse=False, deadline=None):
         if user_params is None:
             user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
         try:
-            query_data = {}
-            if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
-                    self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
-                audio_fingerprint_opt = {
-                    'filter_energy_min': self.filter_energy_min,
-                    'silence_energy_threshold': self.silence_energy_threshold,
-                    'silence_rate_threshold': self.silence_rate_threshold
-                }
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_file(file_path, start_seconds,
-                                                                                     rec_length, False,
-                                                                                     audio_fingerprint_opt)
-            if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
-                    self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
-                query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_file(file_path,
-                                                                                                 start_seconds,
-                                                                                                 rec_length, 2)
-
+            query_data = self.within_deadline(deadline, self.create_query_data_by_file,
+                                              file_path, start_seconds, rec_length)
             res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout, user_params)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+                                   self.timeout, user_params, deadline)
+            res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
         return res
 
-    def recognize_by_filebuffer(self, file_buffer, start_seconds, rec_length=10, user_params=None):
+    def recognize_by_filebuffer(self, file_buffer, start_seconds, rec_length=10, user_params=None, parse=False,
+                                deadline=None):
         if user_params is None:
             user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
         try:
-            query_data = {}
-            if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
-                    self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
-                audio_fingerprint_opt = {
-                    'filter_energy_min': self.filter_energy_min,
-                    'silence_energy_threshold': self.silence_energy_threshold,
-                    'silence_rate_threshold': self.silence_rate_threshold
-                }
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_filebuffer(file_buffer, start_seconds,
-                                                                                           rec_length, False,
-                                                                                           audio_fingerprint_opt)
-            if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or
-                    self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
-                query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_filebuffer(file_buffer,
-                                                                                                       start_seconds,
-                                                                                                       rec_length, 2)
+            query_data = self.within_deadline(deadline, self.create_query_data_by_filebuffer,
+                                              file_buffer, start_seconds, rec_length)
+            res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
+                                   self.timeout, user_params, deadline)
+            res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
+        except Exception as e:
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
+        return res
 
+    def recognize_by_mmap(self, file_path, start_seconds, rec_length=10, user_params=None, parse=False, deadline=None):
+        '''
+        recognize_by_filebuffer without reading the file into memory: the file is mapped
+        read-only and pages are loaded only as the decoder touches them. Builds of
+        acrcloud_extr_tool that only take bytes still get a copy (see call_native).
+        '''
+        if user_params is None:
+            user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
+        try:
+            query_data = self.within_deadline(deadline, self.create_query_data_by_mmap,
+                                              file_path, start_seconds, rec_length)
             res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout, user_params)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+                                   self.timeout, user_params, deadline)
+            res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
         return res
 
-    def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10, user_params=None):
+    def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10, user_params=None, parse=False,
+                              deadline=None):
         if user_params is None:
             user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
         try:
-            query_data = {}
-            if (self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or
-                    self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH):
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_fpbuffer(fp_buffer, start_seconds,
-                                                                                         rec_length)
+            query_data = self.within_deadline(deadline, self.create_query_data_by_fpbuffer,
+                                              fp_buffer, start_seconds, rec_length)
+            res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
+                                   self.timeout, user_params, deadline)
+            res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
+        except Exception as e:
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
+        return res
 
+    def recognize(self, wav_audio_buffer, user_params=None, parse=False, deadline=None):
+        if user_params is None:
+            user_params = {}
+        deadline = ACRCloudDeadline.of(deadline)
+        try:
+            query_data = self.within_deadline(deadline, self.create_query_data_by_pcm, wav_audio_buffer)
             res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout, user_params)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+                                   self.timeout, user_params, deadline)
+            res = self.check_result(res, parse)
+        except ACRCloudDeadlineExceeded:
+            res = self.error_result(ACRCloudStatusCode.TIMEOUT_ERROR_CODE, '', parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = self.error_result(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e), parse)
         return res
 
+    def scan_file(self, file_path, step=10, rec_length=10, user_params=None, parse=False, strategy='fixed',
+                  summary=None, min_score=80, verify_margin=5, coarse_step=60, precision=None):
+        '''
+        Recognize a whole file window by window, decoding it only once.
+
+        The file is decoded to 8000 Hz mono PCM a single time and windows of rec_length
+        seconds are fingerprinted from that buffer. Yields (start_seconds, result) in time
+        order as each window is recognized. strategy chooses the windows:
+
+          'fixed'           one window every step seconds, like the README loop.
+          'skip_matched'    like 'fixed', but after a match scoring at least min_score the
+                            scan probes verify_margin seconds before the matched track's
+                            predicted end (from play_offset_ms / duration_ms) and, if the
+                            probe still hears the same track, resumes at that end. If it
+                            does not, the track ended early: the interval up to the probe
+                            is bisected to step seconds and the scan resumes at the probe.
+          'coarse_to_fine'  one window every coarse_step seconds; between two windows with
+                            different results the interval is bisected until the boundary
+                            is located to precision seconds (default step). Segments
+                            shorter than coarse_step can fall between samples and be missed.
+
+        Pass an ACRCloudScanSummary as summary to get identify calls made and saved.
+        '''
+        if summary is None:
+            summary = ACRCloudScanSummary()
+        try:
+            started = self.stage_start()
+            pcm = acrcloud_extr_tool.decode_audio_by_file(file_path, 0, 0)
+            self.stage_end('decode', started, len(pcm or b''))
+        except Exception as e:
+            yield 0, self.error_result(ACRCloudStatusCode.DECODE_ERROR_CODE, str(e), parse)
+            return
+        if not pcm:
+            yield 0, self.error_result(ACRCloudStatusCode.DECODE_ERROR_CODE, '', parse)
+            return
+
+        summary.duration_seconds = len(pcm) / float(self.PCM_BYTES_PER_SECOND)
+        summary.fixed_calls = len(range(0, len(pcm), self.pcm_bytes(step)))
+        if strategy == 'fixed':
+            for start_seconds, window in self.iter_pcm_windows(pcm, step, rec_length):
+                summary.identify_calls += 1
+                yield start_seconds, self.recognize(window, user_params, parse)
+        elif strategy == 'skip_matched':
+            for start_seconds, res in self.scan_skip_matched(pcm, step, rec_length, user_params, summary,
+                                                             min_score, verify_margin):
+                yield start_seconds, res if parse else str(res)
+        elif strategy == 'coarse_to_fine':
+            for start_seconds, res in self.scan_coarse_to_fine(pcm, coarse_step, precision or step, rec_length,
+                                                               user_params, summary):
+                yield start_seconds, res if parse else str(res)
+        else:
+            raise ValueError('unknown scan strategy: %r' % (strategy,))
+
+    def scan_skip_matched(self, pcm, step, rec_length, user_params, summary, min_score, verify_margin):
+        duration = summary.duration_seconds
+        failed = set()  # (track, probe) pairs that did not hear the track
+        position, res = 0, None
+        while position < duration:
+            if res is None:
+                res = self.recognize_pcm_window(pcm, position, rec_length, user_params, summary)
+                yield position, res
+            match = self.confident_match(res, min_score)
+            probe = None
+            if match is not None:
+                # play_offset_ms is where in the track the window ended.
+                track_end = position + rec_length + (match.duration_ms - match.play_offset_ms) / 1000.0
+                # a track running past the end of the file is probed in the last full window.
+                probe = self.round_seconds(min(track_end - verify_margin, duration) - rec_length)
+                if probe <= position + step or (self.segment_label(res), probe) in failed:
+                    probe = None
+            if probe is None:
+                position, res = self.round_seconds(position + step), None
+                continue
+
+            probe_res = self.recognize_pcm_window(pcm, probe, rec_length, user_params, summary)
+            probe_match = self.confident_match(probe_res, min_score)
+            if probe_match is not None and self.same_track(match, probe_match):
+                yield probe, probe_res
+                summary.skipped_seconds += probe - position - step
+                position, res = self.round_seconds(track_end), None
+                continue
+
+            # the track did not run to its predicted end (a shorter edit than the catalogue's):
+            # locate where it stopped between the match and the probe, then go on from the probe.
+            failed.add((self.segment_label(res), probe))
+            for item in self.scan_bisect(pcm, (position, res), (probe, probe_res), step, rec_length,
+                                         user_params, summary):
+                yield item
+            yield probe, probe_res
+            position, res = probe, probe_res
+
+    def scan_coarse_to_fine(self, pcm, coarse_step, precision, rec_length, user_params, summary):
+        duration = summary.duration_seconds
+        previous = None
+        position = 0
+        while position < duration:
+            res = self.recognize_pcm_window(pcm, position, rec_length, user_params, summary)
+            if previous is not None:
+                for item in self.scan_bisect(pcm, previous, (position, res), precision, rec_length,
+                                             user_params, summary):
+                    yield item
+            yield position, res
+            previous = (position, res)
+            position = self.round_seconds(position + coarse_step)
+
+    def scan_bisect(self, pcm, left, right, precision, rec_length, user_params, summary):
+        # yields the windows strictly between left and right, in time order.
+        if self.segment_label(left[1]) == self.segment_label(right[1]) or right[0] - left[0] <= precision:
+            return
+        middle = self.round_seconds((left[0] + right[0]) / 2.0)
+        middle = (middle, self.recognize_pcm_window(pcm, middle, rec_length, user_params, summary))
+        for item in self.scan_bisect(pcm, left, middle, precision, rec_length, user_params, summary):
+            yield item
+        yield middle
+        for item in self.scan_bisect(pcm, middle, right, precision, rec_length, user_params, summary):
+            yield item
+
+    @staticmethod
+    def segment_label(res):
+        match = res.top_match if res.status_code == 0 else None
+        if match is None:
+            return None
+        return match.acrid or match.title
+
+    def recognize_pcm_window(self, pcm, start_seconds, rec_length, user_params, summary):
+        offset = self.pcm_bytes(start_seconds)
+        summary.identify_calls += 1
+        return self.recognize(memoryview(pcm)[offset:offset + self.pcm_bytes(rec_length)], user_params, True)
+
+    @staticmethod
+    def confident_match(res, min_score):
+        match = res.top_match if res.status_code == 0 else None
+        if match is None or match.duration_ms is None or match.play_offset_ms is None:
+            return None
+        if (match.score or 0) < min_score:
+            return None
+        return match
+
+    @staticmethod
+    def same_track(a, b):
+        if a.acrid or b.acrid:
+            return a.acrid == b.acrid
+        return a.title == b.title
+
+    @classmethod
+    def pcm_bytes(cls, seconds):
+        # offsets are kept on sample boundaries (2 bytes per sample).
+        return int(seconds * cls.PCM_BYTES_PER_SECOND) // 2 * 2
+
+    @staticmethod
+    def round_seconds(seconds):
+        seconds = round(seconds, 3)
+        return int(seconds) if float(seconds).is_integer() else seconds
+
+    def recognize_stream(self, pcm_chunks, window=10, hop=10, user_params=None, parse=False, deadline=None):
+        '''
+        Recognize a live stream of raw PCM (16 bit, mono, 8000 Hz).
+
+        pcm_chunks is any iterable of bytes-like chunks of arbitrary size. The stream is
+        kept in a preallocated ring buffer of window seconds; each time a window of
+        window seconds completes (every hop seconds) it is fingerprinted straight from the
+        ring and (start_seconds, result) is yielded, start_seconds counted from the
+        beginning of the stream. A deadline in seconds applies to each window, counted
+        from the moment the window completes.
+        '''
+        ring = ACRCloudPCMRingBuffer.for_windows(window, hop, self.PCM_BYTES_PER_SECOND)
+        for chunk in pcm_chunks:
+            for start_seconds, pcm in ring.feed(chunk):
+                yield start_seconds, self.recognize(pcm, user_params, parse, deadline)
+
+    @classmethod
+    def iter_pcm_windows(cls, pcm, step, rec_length):
+        step_bytes = max(2, cls.pcm_bytes(step))
+        window_bytes = cls.pcm_bytes(rec_length)
+        for offset in range(0, len(pcm), step_bytes):
+            start_seconds = offset / cls.PCM_BYTES_PER_SECOND
+            if start_seconds.is_integer():
+                start_seconds = int(start_seconds)
+            yield start_seconds, pcm[offset:offset + window_bytes]
+
     @staticmethod
     def get_duration_ms_by_file(file_path):
         try:
@@ -283,7 +1287,8 @@ class ACRCloudRecognizer:
     @staticmethod
     def get_duration_ms_by_filebuffer(file_buffer):
         try:
-            duration_ms = acrcloud_extr_tool.get_duration_ms_by_filebuffer(file_buffer)
+            duration_ms = ACRCloudRecognizer.call_native(acrcloud_extr_tool.get_duration_ms_by_filebuffer,
+                                                         file_buffer)
             return duration_ms
         except Exception as e:
             return 0
@@ -297,33 +1302,6 @@ class ACRCloudRecognizer:
             return 0
 
 
-class ACRCloudStatusCode:
-    HTTP_ERROR_CODE = 3000
-    NO_RESULT_CODE = 1001
-    GEN_FINGERPRINT_ERROR_CODE = 2004
-    DECODE_ERROR_CODE = 2006
-    UNKNOW_ERROR_CODE = 2010
-    JSON_ERROR_CODE = 2002
-
-    CODE_MSG = {
-        HTTP_ERROR_CODE: 'Http Error',
-        NO_RESULT_CODE: 'No Result',
-        GEN_FINGERPRINT_ERROR_CODE: 'Gen Fingerprint Error (May Be Mute)',
-        DECODE_ERROR_CODE: 'Decode Audio Error',
-        UNKNOW_ERROR_CODE: 'Unknow Error',
-        JSON_ERROR_CODE: 'Json Error'
-    }
-
-    @staticmethod
-    def get_result_error(res_code, msg=''):
-        if ACRCloudStatusCode.CODE_MSG.get(res_code) is None:
-            return None
-        res = {'status': {'msg': ACRCloudStatusCode.CODE_MSG[res_code], 'code': res_code}}
-        if msg:
-            res = {'status': {'msg': ACRCloudStatusCode.CODE_MSG[res_code] + ':' + msg, 'code': res_code}}
-        return json.dumps(res)
-
-
 if __name__ == '__main__':
     config = {
         'host': 'ap-southeast-1.api.acrcloud.com',
@@ -0,0 +1,564 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, time, random, struct, datetime, threading, collections
+
+from acrcloud.instrument import ACRCloudStageStats
+
+'''
+What the recognizer does when the service, the network or a decode misbehaves:
+deadlines and the thread / process pools that enforce them, retries and their budget,
+hedging, host routing with circuit breaking and rate limiting. Re-exported by
+acrcloud.recognizer.
+'''
+
+
+class ACRCloudDeadlineExceeded(TimeoutError):
+    pass
+
+
+class ACRCloudDeadline:
+    '''
+    A point in time by which a whole recognize_* call must be done, on the monotonic
+    clock. of() takes what the recognize_* methods accept as deadline: a number of
+    seconds from now, a datetime, or an ACRCloudDeadline (e.g. one shared by several
+    calls). at() builds one from a time.time() timestamp.
+    '''
+
+    def __init__(self, expires):
+        self.expires = expires
+
+    @classmethod
+    def after(cls, seconds):
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def at(cls, timestamp):
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = timestamp.timestamp()
+        return cls(time.monotonic() + timestamp - time.time())
+
+    @classmethod
+    def of(cls, deadline):
+        if deadline is None or isinstance(deadline, ACRCloudDeadline):
+            return deadline
+        if isinstance(deadline, datetime.datetime):
+            return cls.at(deadline)
+        return cls.after(deadline)
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def timeout(self, timeout):
+        '''timeout, cut down to the time left.'''
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self):
+        if self.expired():
+            raise ACRCloudDeadlineExceeded()
+
+
+def _deadline_worker(conn, worker_config):
+    from acrcloud.recognizer import ACRCloudRecognizer, use_worker_extr_tool
+    use_worker_extr_tool(worker_config)
+    re = ACRCloudRecognizer(worker_config)
+    while True:
+        try:
+            name, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            res = (True, getattr(re, name)(*args))
+        except Exception as e:
+            res = (False, e)
+        conn.send(res)
+
+
+class ACRCloudDeadlineThreads:
+    '''
+    Runs calls with a deadline each on a thread of its own, at most max_workers at a
+    time. A native call can not be interrupted, so a call still running at its deadline
+    is abandoned: its thread runs on to the next stage boundary (or the end of the
+    native call), but gives its slot back at once, so later calls never queue behind a
+    hung one. abandoned counts the calls abandoned.
+    '''
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, int(max_workers))
+        self.abandoned = 0
+        self._slots = threading.Semaphore(self.max_workers)
+        self._lock = threading.Lock()
+
+    def call(self, deadline, func, *args):
+        '''func(*args) on a new thread; ACRCloudDeadlineExceeded at the deadline.'''
+        if not self._slots.acquire(timeout=max(0.0, deadline.remaining())):
+            raise ACRCloudDeadlineExceeded()
+        call = _ACRCloudDeadlineCall(self._slots, func, args)
+        try:
+            threading.Thread(target=call.run, name='acrcloud-deadline', daemon=True).start()
+        except BaseException:
+            call.release()
+            raise
+        if not call.done.wait(deadline.remaining()) and call.release():
+            with self._lock:
+                self.abandoned += 1
+            raise ACRCloudDeadlineExceeded()
+        call.done.wait()
+        if not call.ok:
+            raise call.value
+        return call.value
+
+
+class _ACRCloudDeadlineCall:
+    def __init__(self, slots, func, args):
+        self.func = func
+        self.args = args
+        self.ok = False
+        self.value = None
+        self.done = threading.Event()
+        self._slots = slots
+        self._held = True
+        self._lock = threading.Lock()
+
+    def run(self):
+        try:
+            self.value = self.func(*self.args)
+            self.ok = True
+        except BaseException as e:
+            self.value = e
+        finally:
+            self.release()
+            self.done.set()
+
+    def release(self):
+        # the slot goes back once: when the call ends or when its caller gives up on it,
+        # whichever comes first. True if this released it.
+        with self._lock:
+            held, self._held = self._held, False
+        if held:
+            self._slots.release()
+        return held
+
+
+class ACRCloudDeadlineProcesses:
+    '''
+    Up to max_workers processes that create query data for calls with a deadline. A call
+    still running at its deadline is stopped by killing its process; a new one is
+    started when needed. killed counts the processes killed.
+    '''
+
+    def __init__(self, worker_config, max_workers=4):
+        self.worker_config = worker_config
+        self.max_workers = max(1, int(max_workers))
+        self.killed = 0
+        self._idle = []  # (process, connection)
+        self._started = 0
+        self._cond = threading.Condition()
+
+    def call(self, deadline, name, *args):
+        '''ACRCloudRecognizer.<name>(*args) in a worker; ACRCloudDeadlineExceeded at the deadline.'''
+        worker = self._acquire(deadline)
+        try:
+            worker[1].send((name, args))
+            if not worker[1].poll(deadline.remaining()):
+                raise ACRCloudDeadlineExceeded()
+            ok, value = worker[1].recv()
+        except BaseException:
+            self._kill(worker)
+            raise
+        self._release(worker)
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for process, conn in idle:
+            conn.close()
+            process.join(1)
+
+    def _acquire(self, deadline):
+        with self._cond:
+            while not self._idle and self._started >= self.max_workers:
+                if not self._cond.wait(deadline.remaining()) and deadline.expired():
+                    raise ACRCloudDeadlineExceeded()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        import multiprocessing
+        try:
+            conn, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_deadline_worker, args=(child, self.worker_config),
+                                              daemon=True)
+            process.start()
+            child.close()
+            return process, conn
+        except BaseException:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _kill(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        with self._cond:
+            self._started -= 1
+            self.killed += 1
+            self._cond.notify()
+
+
+class ACRCloudRetryBudget:
+    '''
+    Caps retries at a fraction of traffic so that retrying can not multiply load during
+    an outage. Every identify request deposits ratio of a token, every retry withdraws
+    one; min_per_second tokens are added over time so that low traffic can still retry.
+    At most max_tokens are banked. shared() is the budget of the whole process.
+    '''
+
+    _shared = None
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_tokens=10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.retries = 0
+        self.exhausted = 0
+        self._tokens = float(max_tokens)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                self.exhausted += 1
+                return False
+            self._tokens -= 1
+            self.retries += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'retries': self.retries, 'exhausted': self.exhausted, 'tokens': self._tokens}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+
+class ACRCloudRetryPolicy:
+    '''
+    When and how long to wait before retrying an identify request: up to max_attempts
+    attempts in all, for network errors, HTTP statuses in retry_statuses and ACRCloud
+    status codes in retry_codes, while budget allows. Waits use exponential backoff with
+    full jitter: uniform(0, min(backoff_max, backoff_base * 2 ** (attempt - 1))).
+    '''
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts=3, backoff_base=0.1, backoff_max=2.0, retry_statuses=RETRY_STATUSES,
+                 retry_codes=(), budget=None):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_codes = frozenset(retry_codes)
+        self.budget = budget or ACRCloudRetryBudget.shared()
+
+    def allow_retry(self, attempt):
+        return attempt < self.max_attempts and self.budget.withdraw()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+class ACRCloudHedgePolicy:
+    '''
+    When to hedge an identify request: if no response has arrived after delay seconds
+    (or, without a fixed delay, the percentile of recently observed latencies, once
+    min_samples are known), a duplicate is sent and the first good response wins. A
+    budget caps hedges at max_rate of requests. requests, hedged and hedge_wins count
+    hedging activity.
+
+    The blocking client hedges only over its connection pool, where the losing request
+    can be aborted: ACRCloudRecognizer refuses a hedge policy with keep_alive=False, and
+    does not hedge requests that go through a proxy.
+    '''
+
+    def __init__(self, percentile=95, delay=None, max_rate=0.1, min_samples=20, max_samples=1000):
+        self.percentile = percentile
+        self.fixed_delay = delay
+        self.min_samples = min_samples
+        self.budget = ACRCloudRetryBudget(max_rate, 0, max(1.0, 100 * max_rate))
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._samples = collections.deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        '''The hedge_policy of a recognizer config, one built from its hedge* keys, or None.'''
+        policy = config.get('hedge_policy')
+        if policy is None and config.get('hedge'):
+            policy = cls(config.get('hedge_percentile', 95), config.get('hedge_delay'),
+                         config.get('hedge_max_rate', 0.1))
+        return policy
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def delay(self):
+        '''Seconds to wait before hedging, or None while there are too few samples.'''
+        self.budget.deposit()
+        with self._lock:
+            self.requests += 1
+            if self.fixed_delay is not None:
+                return self.fixed_delay
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ACRCloudStageStats.percentile(ordered, self.percentile)
+
+    def allow_hedge(self):
+        if not self.budget.withdraw():
+            return False
+        with self._lock:
+            self.hedged += 1
+        return True
+
+    def won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins,
+                    'hedge_rate': self.hedged / float(self.requests) if self.requests else 0.0}
+
+
+class ACRCloudHostRouter:
+    '''
+    Routes identify requests across equivalent hosts. Each request goes to the healthy
+    host with the lowest EWMA of observed latency (hosts not yet measured first, and a
+    random healthy host with probability explore so that estimates stay current).
+    Outcomes of real requests are the health check: failure_threshold consecutive
+    failures open a host's circuit for open_seconds, after which a single probe request
+    is let through (half-open) and closes the circuit again on success. When every
+    circuit is open, the host due to reopen first is used rather than failing outright.
+    '''
+
+    def __init__(self, hosts, ewma_alpha=0.3, failure_threshold=3, open_seconds=10, explore=0.05):
+        self.hosts = list(hosts)
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.explore = explore
+        self._latency = dict((host, None) for host in self.hosts)
+        self._failures = dict((host, 0) for host in self.hosts)
+        self._open_until = dict((host, 0.0) for host in self.hosts)
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def choose(self, exclude=()):
+        now = time.monotonic()
+        with self._lock:
+            healthy = [host for host in self.hosts if host not in exclude and self._available(host, now)]
+            if not healthy:
+                candidates = [host for host in self.hosts if host not in exclude] or self.hosts
+                return min(candidates, key=lambda host: self._open_until[host])
+            if len(healthy) > 1 and random.random() < self.explore:
+                host = random.choice(healthy)
+            else:
+                host = min(healthy, key=lambda host: self._latency[host] or 0.0)
+            if self._open_until[host]:
+                self._probing.add(host)
+            return host
+
+    def record(self, host, seconds, ok):
+        with self._lock:
+            if host not in self._latency:
+                return
+            self._probing.discard(host)
+            if ok:
+                latency = self._latency[host]
+                self._latency[host] = seconds if latency is None else (
+                    self.ewma_alpha * seconds + (1 - self.ewma_alpha) * latency)
+                self._failures[host] = 0
+                self._open_until[host] = 0.0
+                return
+            self._failures[host] += 1
+            if self._open_until[host] or self._failures[host] >= self.failure_threshold:
+                self._open_until[host] = time.monotonic() + self.open_seconds
+
+    def abandon(self, host):
+        '''Gives back the probe slot of a request to host that ended without an outcome.'''
+        with self._lock:
+            self._probing.discard(host)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return dict((host, {'ewma_ms': (self._latency[host] or 0.0) * 1000,
+                                'failures': self._failures[host],
+                                'open': self._open_until[host] > now}) for host in self.hosts)
+
+    def _available(self, host, now):
+        open_until = self._open_until[host]
+        if not open_until:
+            return True
+        # half-open: one probe at a time once the open period is over.
+        return now >= open_until and host not in self._probing
+
+
+class ACRCloudRateLimiter:
+    '''
+    Token bucket of rate requests per second holding at most burst tokens, safe to share
+    between threads and asyncio tasks. With path, the bucket lives in that file (locked
+    with flock) and is shared by every process using the same path, forked children
+    included: a child reopens the file, as an inherited descriptor would share its lock
+    with the parent. get() returns one limiter per (rate, burst, path) for the whole process.
+
+    acquire() blocks until a token is free; blocking=False takes one only if it is
+    free now; timeout=seconds gives up (without waiting) when no token can be had by
+    then. acquire_async() does the same without blocking the event loop. acquired,
+    rejected, waits and wait_seconds count limiter activity.
+    '''
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rate, burst=None, path=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.path = path
+        self.acquired = 0
+        self.rejected = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        if path:
+            self._open()
+
+    @classmethod
+    def get(cls, rate, burst=None, path=None):
+        key = (rate, burst, path)
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = cls._instances[key] = cls(rate, burst, path)
+            return instance
+
+    def acquire(self, blocking=True, timeout=None):
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            wait = self.take()
+            if wait == 0:
+                return self._acquired(started)
+            if not blocking or (deadline is not None and time.monotonic() + wait > deadline):
+                return self._rejected()
+            time.sleep(wait)
+
+    async def acquire_async(self, blocking=True, timeout=None):
+        import asyncio
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            wait = self.take()
+            if wait == 0:
+                return self._acquired(started)
+            if not blocking or (deadline is not None and time.monotonic() + wait > deadline):
+                return self._rejected()
+            await asyncio.sleep(wait)
+
+    def take(self):
+        '''Takes a token if one is free and returns 0, or returns the seconds until one is.'''
+        with self._lock:
+            if self._fd is None:
+                now = time.monotonic()
+                self._tokens, self._updated, wait = self._refill_take(self._tokens, self._updated, now)
+                return wait
+            import fcntl
+            if self._pid != os.getpid():
+                os.close(self._fd)
+                self._open()
+            # CLOCK_MONOTONIC is system-wide, so processes can share the stored timestamp.
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                # read the clock under the lock: an earlier timestamp written after a later
+                # one would hand out the tokens between them twice.
+                now = time.monotonic()
+                state = os.pread(self._fd, 16, 0)
+                tokens, updated = struct.unpack('dd', state) if len(state) == 16 else (self.burst, now)
+                tokens, updated, wait = self._refill_take(tokens, updated, now)
+                os.pwrite(self._fd, struct.pack('dd', tokens, updated), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            return wait
+
+    def stats(self):
+        with self._lock:
+            return {'acquired': self.acquired, 'rejected': self.rejected, 'waits': self.waits,
+                    'wait_seconds': self.wait_seconds, 'max_wait_seconds': self.max_wait_seconds}
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+
+    def _refill_take(self, tokens, updated, now):
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, now, 0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def _acquired(self, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.acquired += 1
+            if waited > 0.0001:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return True
+
+    def _rejected(self):
+        with self._lock:
+            self.rejected += 1
+        return False
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Identify responses and errors: ACRCloudJson codecs, ACRCloudStatusCode, and the parsed
+ACRCloudRecognitionResult with its ACRCloudMatch entries. Re-exported by acrcloud.recognizer.
+'''
+
+
+class ACRCloudJson:
+    '''
+    JSON loads/dumps through a selectable backend: 'orjson', 'ujson', 'json' (stdlib) or
+    'auto', which picks the first of them that is installed. A backend that can not be
+    imported falls back to 'auto'.
+    '''
+
+    BACKENDS = ('orjson', 'ujson', 'json')
+    _instances = {}
+
+    def __init__(self, backend='auto'):
+        names = self.BACKENDS if backend == 'auto' else (backend,) + self.BACKENDS
+        for name in names:
+            try:
+                module = __import__(name)
+            except ImportError:
+                continue
+            self.name = name
+            self.loads = module.loads
+            if name == 'orjson':
+                self.dumps = lambda obj, dumps=module.dumps: dumps(obj).decode('utf8')
+            else:
+                self.dumps = module.dumps
+            break
+
+    @classmethod
+    def get(cls, backend='auto'):
+        instance = cls._instances.get(backend)
+        if instance is None:
+            instance = cls._instances[backend] = cls(backend)
+        return instance
+
+
+class ACRCloudScanSummary:
+    '''Counters filled in by ACRCloudRecognizer.scan_file.'''
+
+    def __init__(self):
+        self.duration_seconds = 0.0
+        self.identify_calls = 0
+        self.fixed_calls = 0  # windows the 'fixed' strategy would have identified
+        self.skipped_seconds = 0.0
+
+    @property
+    def calls_saved(self):
+        return self.fixed_calls - self.identify_calls
+
+    def __repr__(self):
+        return ('ACRCloudScanSummary(duration_seconds=%.1f, identify_calls=%d, fixed_calls=%d, calls_saved=%d)' %
+                (self.duration_seconds, self.identify_calls, self.fixed_calls, self.calls_saved))
+
+
+class ACRCloudMatch:
+    '''One entry of a result's metadata (a music track, custom file, stream ...).'''
+
+    __slots__ = ('kind', 'data')
+
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
+
+    def __repr__(self):
+        return 'ACRCloudMatch(%r, %r)' % (self.kind, self.title)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    @property
+    def acrid(self):
+        return self.data.get('acrid')
+
+    @property
+    def title(self):
+        return self.data.get('title')
+
+    @property
+    def score(self):
+        return self.data.get('score')
+
+    @property
+    def play_offset_ms(self):
+        return self.data.get('play_offset_ms')
+
+    @property
+    def duration_ms(self):
+        return self.data.get('duration_ms')
+
+    @property
+    def sample_begin_time_offset_ms(self):
+        return self.data.get('sample_begin_time_offset_ms')
+
+    @property
+    def sample_end_time_offset_ms(self):
+        return self.data.get('sample_end_time_offset_ms')
+
+    @property
+    def db_begin_time_offset_ms(self):
+        return self.data.get('db_begin_time_offset_ms')
+
+    @property
+    def db_end_time_offset_ms(self):
+        return self.data.get('db_end_time_offset_ms')
+
+
+class ACRCloudRecognitionResult:
+    '''
+    Parsed identify response, returned by the recognize_* methods when parse=True.
+
+    It wraps the one parsed tree of the response; ACRCloudMatch objects for the
+    metadata are only built the first time matches (or a property using them) is read.
+    str() gives back the response text (or, for a tree built without one, the tree
+    serialized with the json backend given, default 'auto').
+    '''
+
+    __slots__ = ('tree', 'raw', '_json', '_matches')
+
+    # metadata lists in the order their entries are considered for top_match.
+    MATCH_KINDS = ('music', 'custom_files', 'humming', 'streams', 'custom_streams')
+
+    def __init__(self, tree, raw=None, json=None):
+        self.tree = tree
+        self.raw = raw
+        self._json = json
+        self._matches = None
+
+    def __str__(self):
+        if self.raw is None:
+            self.raw = (self._json or ACRCloudJson.get()).dumps(self.tree)
+        return self.raw
+
+    def __repr__(self):
+        return 'ACRCloudRecognitionResult(code=%r, matches=%d)' % (self.status_code, len(self.matches))
+
+    def __getitem__(self, key):
+        return self.tree[key]
+
+    def get(self, key, default=None):
+        return self.tree.get(key, default)
+
+    @property
+    def status(self):
+        return self.tree.get('status', {})
+
+    @property
+    def status_code(self):
+        return self.status.get('code')
+
+    @property
+    def status_msg(self):
+        return self.status.get('msg')
+
+    @property
+    def attempts(self):
+        '''Identify requests sent for this result (more than 1 when it was retried).'''
+        return self.tree.get('attempts', 1)
+
+    @property
+    def is_match(self):
+        return self.status_code == 0 and bool(self.matches)
+
+    @property
+    def metadata(self):
+        return self.tree.get('metadata', {})
+
+    @property
+    def matches(self):
+        if self._matches is None:
+            metadata = self.metadata
+            matches = []
+            for kind in self.MATCH_KINDS:
+                for data in metadata.get(kind) or ():
+                    matches.append(ACRCloudMatch(kind, data))
+            self._matches = tuple(matches)
+        return self._matches
+
+    @property
+    def top_match(self):
+        matches = self.matches
+        return matches[0] if matches else None
+
+    @property
+    def score(self):
+        match = self.top_match
+        return match.score if match is not None else None
+
+    @property
+    def play_offset_ms(self):
+        match = self.top_match
+        return match.play_offset_ms if match is not None else None
+
+    @property
+    def duration_ms(self):
+        match = self.top_match
+        return match.duration_ms if match is not None else None
+
+
+class ACRCloudStatusCode:
+    HTTP_ERROR_CODE = 3000
+    NO_RESULT_CODE = 1001
+    GEN_FINGERPRINT_ERROR_CODE = 2004
+    DECODE_ERROR_CODE = 2006
+    UNKNOW_ERROR_CODE = 2010
+    JSON_ERROR_CODE = 2002
+    RATE_LIMIT_ERROR_CODE = 3015
+    TIMEOUT_ERROR_CODE = 2011
+
+    CODE_MSG = {
+        HTTP_ERROR_CODE: 'Http Error',
+        NO_RESULT_CODE: 'No Result',
+        GEN_FINGERPRINT_ERROR_CODE: 'Gen Fingerprint Error (May Be Mute)',
+        DECODE_ERROR_CODE: 'Decode Audio Error',
+        UNKNOW_ERROR_CODE: 'Unknow Error',
+        JSON_ERROR_CODE: 'Json Error',
+        RATE_LIMIT_ERROR_CODE: 'Rate Limited',
+        TIMEOUT_ERROR_CODE: 'Deadline Exceeded'
+    }
+
+    @staticmethod
+    def get_result_error(res_code, msg=''):
+        if ACRCloudStatusCode.CODE_MSG.get(res_code) is None:
+            return None
+        res = {'status': {'msg': ACRCloudStatusCode.CODE_MSG[res_code], 'code': res_code}}
+        if msg:
+            res = {'status': {'msg': ACRCloudStatusCode.CODE_MSG[res_code] + ':' + msg, 'code': res_code}}
+        # always the stdlib's text: error results look the same whatever json_backend is.
+        return ACRCloudJson.get('json').dumps(res)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import time, socket, ssl, select, threading, collections
+import http.client
+import urllib.request
+import urllib.parse
+
+'''
+HTTP transport of the identify requests: the keep-alive ACRCloudConnectionPool, the
+ACRCloudRequestHandle through which another thread aborts a pooled request, and the
+ACRCloudMultipartEncoder that streams the request body. Re-exported by acrcloud.recognizer.
+'''
+
+
+class ACRCloudPoolExhausted(TimeoutError):
+    '''No pooled connection came free in time: back-pressure in this client, not a host failure.'''
+
+
+class ACRCloudProxyRules:
+    '''
+    Whether urllib would send a request through a proxy: the environment's proxies
+    (HTTPS_PROXY, ...) as read when created and no_proxy, remembered per host.
+    '''
+
+    def __init__(self):
+        self._proxies = urllib.request.getproxies()
+        self._applies = {}  # (scheme, host) -> bool
+
+    def applies(self, url):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname)
+        applies = self._applies.get(key)
+        if applies is None:
+            applies = self._applies[key] = bool(parts.scheme in self._proxies and
+                                                not urllib.request.proxy_bypass(parts.hostname))
+        return applies
+
+
+class ACRCloudConnectionPool:
+    '''
+    Thread-safe pool of persistent http.client connections, keyed by (scheme, host, port).
+
+    At most max_per_host connections are open per host (callers wait for a free one),
+    idle connections older than idle_timeout seconds are closed, and a request sent on a
+    reused connection that the server has already closed is retried once on a new one.
+
+    The pool connects directly. proxied(url) tells whether urllib would go through a
+    proxy for url (HTTPS_PROXY, no_proxy, ... as read when the pool was created), in
+    which case the request should be left to urllib.
+    '''
+
+    RETRYABLE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                        ConnectionResetError, ConnectionAbortedError, BrokenPipeError,
+                        ssl.SSLEOFError, ssl.SSLZeroReturnError)
+
+    def __init__(self, max_per_host=4, idle_timeout=30, ssl_context=None):
+        self.max_per_host = max(1, int(max_per_host))
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self._cond = threading.Condition()
+        self._idle = {}  # key -> deque of (connection, last_used)
+        self._open = {}  # key -> number of open connections (idle + in use)
+        self._proxy_rules = ACRCloudProxyRules()
+
+    def proxied(self, url):
+        return self._proxy_rules.applies(url)
+
+    def request(self, method, url, body=None, headers=None, timeout=5, handle=None):
+        '''handle: an ACRCloudRequestHandle through which another thread may abort the request.'''
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path = path + '?' + parts.query
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            if handle is not None:
+                handle.attach(conn)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except self.RETRYABLE_ERRORS:
+                self._release(key, conn, False, handle)
+                if reused and attempt == 0 and not (handle is not None and handle.cancelled):
+                    continue
+                raise
+            except BaseException:
+                self._release(key, conn, False, handle)
+                raise
+            self._release(key, conn, not resp.will_close, handle)
+            return resp.status, resp.reason, data
+
+    def close(self):
+        with self._cond:
+            for key, idle in self._idle.items():
+                while idle:
+                    conn, _ = idle.pop()
+                    conn.close()
+                    self._open[key] -= 1
+            self._cond.notify_all()
+
+    def _acquire(self, key, timeout):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while True:
+                self._evict_idle(time.monotonic())
+                idle = self._idle.get(key)
+                while idle:
+                    conn, _ = idle.pop()
+                    if not self._is_stale(conn):
+                        return conn, True
+                    conn.close()
+                    self._open[key] -= 1
+                if self._open.get(key, 0) < self.max_per_host:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise ACRCloudPoolExhausted('connection pool exhausted for %s' % key[1])
+                self._cond.wait(remaining)
+
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def _release(self, key, conn, reusable, handle=None):
+        # once back in the pool conn may serve another request: a late cancel() of this
+        # one must not shut it down.
+        if handle is not None and not handle.detach(conn):
+            reusable = False
+        with self._cond:
+            if reusable and conn.sock is not None:
+                self._idle.setdefault(key, collections.deque()).append((conn, time.monotonic()))
+            else:
+                conn.close()
+                self._open[key] -= 1
+            self._cond.notify()
+
+    def _evict_idle(self, now):
+        for key, idle in self._idle.items():
+            # connections are appended on release, so the oldest sit on the left.
+            while idle and now - idle[0][1] > self.idle_timeout:
+                conn, _ = idle.popleft()
+                conn.close()
+                self._open[key] -= 1
+
+    @staticmethod
+    def _is_stale(conn):
+        # An idle keep-alive socket must have nothing to read; readable means the
+        # server sent EOF (or garbage) and the connection can not be reused.
+        sock = conn.sock
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+
+class ACRCloudRequestHandle:
+    '''Lets another thread abort an in-flight pooled request by shutting its socket down.'''
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self._conn = conn
+            if self.cancelled:
+                self._shutdown()
+
+    def detach(self, conn):
+        '''Called when the pool takes conn back; False if the request was cancelled.'''
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+            return not self.cancelled
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            self._shutdown()
+
+    def _shutdown(self):
+        sock = self._conn.sock if self._conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class ACRCloudMultipartEncoder:
+    '''
+    multipart/form-data body held as a list of buffers instead of one concatenated bytes.
+
+    The boundary and part headers are rendered once; file values are referenced through
+    memoryviews, so the fingerprint / PCM payload is never copied. Iterating yields the
+    segments in wire order (http.client and urllib send each one as it comes), and
+    content_length is the exact body size for the Content-Length header.
+    '''
+
+    CRLF = '\r\n'
+
+    def __init__(self, fields, files, boundary=None):
+        if boundary is None:
+            boundary = "*****2016.05.27.acrcloud.rec.copyright." + str(time.time()) + "*****"
+        CRLF = self.CRLF
+        L = []
+        for (key, value) in list(fields.items()):
+            L.append('--' + boundary)
+            L.append('Content-Disposition: form-data; name="%s"' % key)
+            L.append('')
+            L.append(value)
+        head = CRLF.join(L).encode('utf-8')
+
+        segments = []
+        for (key, value) in list(files.items()):
+            L = []
+            L.append(CRLF + '--' + boundary)
+            L.append('Content-Disposition: form-data; name="%s"; filename="%s"' % (key, key))
+            L.append('Content-Type: application/octet-stream')
+            L.append(CRLF)
+            # small header pieces are merged so each payload costs one extra write at most.
+            segments.append(head + CRLF.join(L).encode('ascii'))
+            segments.append(memoryview(value).cast('B'))
+            head = b''
+        segments.append(head + (CRLF + '--' + boundary + '--' + CRLF + CRLF).encode('ascii'))
+
+        self.boundary = boundary
+        self.content_type = 'multipart/form-data; boundary=%s' % boundary
+        self.segments = segments
+        self.content_length = sum(len(segment) for segment in segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def to_bytes(self):
+        return b''.join(self.segments)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Shared helpers for the benchmark scripts in this directory.
+
+The scripts never talk to the real ACRCloud API: they start the identify emulator
+from acrcloud.bench and, when the native acrcloud_extr_tool module is not installed,
+select the stub from acrcloud.bench.extr_tool_stub in its place.
+'''
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+try:
+    import acrcloud_extr_tool
+except ImportError:
+    os.environ['ACRCLOUD_EXTR_TOOL'] = 'stub'
+
+from acrcloud.bench import extr_tool_stub
+from acrcloud.bench.emulator import ACRCloudIdentifyEmulator, client_ssl_context
+
+
+def use_stub_extr_tool(**settings):
+    '''Select the stub, even when the native module exists. Call before importing acrcloud.recognizer.'''
+    # the environment also reaches worker processes that import acrcloud.recognizer afresh.
+    os.environ['ACRCLOUD_EXTR_TOOL'] = 'stub'
+    extr_tool_stub.configure(**settings)
+    return extr_tool_stub
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LocalIdentifyServer(ACRCloudIdentifyEmulator):
+    '''The emulator with the access key every script uses ('bench', secret 'bench').'''
+
+    def __init__(self, latency=0.0, **kwargs):
+        kwargs.setdefault('access_keys', {'bench': 'bench'})
+        ACRCloudIdentifyEmulator.__init__(self, latency, **kwargs)
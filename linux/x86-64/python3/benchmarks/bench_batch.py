@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Scaling of BatchRecognizer across fingerprint worker counts, using the stub
+extractor (fixed CPU cost per fingerprint) and a local identify server.
+
+    >>> python benchmarks/bench_batch.py --files 200 --workers 1 2 4 8
+'''
+
+import time, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud.batch import BatchRecognizer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--fingerprint-cost', type=float, default=2e-3,
+                        help='stub CPU seconds per second of audio fingerprinted')
+    parser.add_argument('--latency', type=float, default=0.02, help='server think time in seconds')
+    args = parser.parse_args()
+
+    stub.configure(fingerprint_cost=args.fingerprint_cost)
+    jobs = [('file%d.mp3' % i, 0, 10) for i in range(args.files)]
+    with LocalIdentifyServer(args.latency) as server:
+        config = {'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                  'ssl_context': client_ssl_context()}
+        print('%-8s %-12s %10s %10s %8s' % ('workers', 'order', 'files/s', 'wall s', 'speedup'))
+        baseline = None
+        for workers in args.workers:
+            for ordered in (True, False):
+                with BatchRecognizer(config, fingerprint_workers=workers) as batch:
+                    started = time.perf_counter()
+                    count = sum(1 for _ in batch.recognize_files(jobs, ordered=ordered))
+                    elapsed = time.perf_counter() - started
+                if baseline is None:
+                    baseline = elapsed
+                print('%-8d %-12s %10.1f %10.2f %8.2f' % (workers, 'ordered' if ordered else 'as-completed',
+                                                          count / elapsed, elapsed, baseline / elapsed))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+ACR_OPT_REC_BOTH fingerprinting: the previous path (create_fingerprint_by_file then
+create_humming_fingerprint_by_file, each decoding the segment) against one decode
+followed by both fingerprints, serially and on a thread or process executor. Run with
+a stub that holds the GIL while fingerprinting and one that releases it.
+
+    >>> python benchmarks/bench_both_mode.py --windows 20 --fingerprint-cost 0.01
+'''
+
+import time, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudRecognizeType
+
+
+def two_decodes(re, windows, rec_length):
+    opt = re.audio_fingerprint_opt()
+    for i in range(windows):
+        stub.create_fingerprint_by_file('synthetic.mp3', i * rec_length, rec_length, False, opt)
+        stub.create_humming_fingerprint_by_file('synthetic.mp3', i * rec_length, rec_length, 2)
+
+
+def decode_once(re, windows, rec_length):
+    for i in range(windows):
+        re.create_query_data_by_file('synthetic.mp3', i * rec_length, rec_length)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--windows', type=int, default=20)
+    parser.add_argument('--length', type=int, default=10)
+    parser.add_argument('--decode-cost', type=float, default=1e-4,
+                        help='stub CPU seconds per second of audio decoded')
+    parser.add_argument('--fingerprint-cost', type=float, default=5e-3,
+                        help='stub CPU seconds per second of audio fingerprinted')
+    args = parser.parse_args()
+
+    print('%-18s %-12s %12s' % ('native GIL', 'mode', 'ms / window'))
+    for releases_gil in (False, True):
+        runs = [('two decodes', 'none', two_decodes), ('serial', 'none', decode_once),
+                ('thread', 'thread', decode_once), ('process', 'process', decode_once)]
+        for name, executor, run in runs:
+            stub.configure(duration_seconds=args.windows * args.length, decode_cost=args.decode_cost,
+                           fingerprint_cost=args.fingerprint_cost, fingerprint_releases_gil=releases_gil)
+            re = ACRCloudRecognizer({'access_key': 'bench', 'access_secret': 'bench', 'keep_alive': False,
+                                     'recognize_type': ACRCloudRecognizeType.ACR_OPT_REC_BOTH,
+                                     'fingerprint_executor': executor})
+            decode_once(re, 1, args.length)  # start the executor's worker
+            started = time.perf_counter()
+            run(re, args.windows, args.length)
+            elapsed = time.perf_counter() - started
+            re.close()
+            print('%-18s %-12s %12.1f' % ('released' if releases_gil else 'held', name,
+                                          elapsed / args.windows * 1000))
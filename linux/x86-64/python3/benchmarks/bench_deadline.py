@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Deadlines: recognize_by_file on a mix of normal files and files whose decode stalls
+(standing in for corrupt ones), without a deadline and with one on thread and on
+process deadline workers. Reports latency percentiles, how many calls returned
+TIMEOUT_ERROR_CODE and how many calls for normal files did.
+
+    >>> python benchmarks/bench_deadline.py --requests 100 --stall-share 0.05 --deadline 0.5
+'''
+
+import time, random, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context, percentile
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudStatusCode
+
+
+def run(server, args, deadline, executor):
+    re = ACRCloudRecognizer({'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                             'ssl_context': client_ssl_context(), 'deadline_executor': executor})
+    rnd = random.Random(args.seed)
+    latencies, timeouts, collateral = [], 0, 0
+    for _ in range(args.requests):
+        stalled = rnd.random() < args.stall_share
+        started = time.perf_counter()
+        res = re.recognize_by_file('stalled.mp3' if stalled else 'synthetic.mp3', 0, parse=True,
+                                   deadline=deadline)
+        latencies.append(time.perf_counter() - started)
+        if res.status_code == ACRCloudStatusCode.TIMEOUT_ERROR_CODE:
+            timeouts += 1
+            collateral += not stalled
+    re.close()
+    return latencies, timeouts, collateral
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--stall-share', type=float, default=0.05)
+    parser.add_argument('--stall-seconds', type=float, default=2.0, help='CPU seconds a stalled decode burns')
+    parser.add_argument('--deadline', type=float, default=0.5, help='seconds')
+    parser.add_argument('--latency', type=float, default=20, help='server latency in ms')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stub.configure(duration_seconds=60, fingerprint_cost=1e-3, stall_files=('stalled.mp3',),
+                   stall_seconds=args.stall_seconds)
+    with LocalIdentifyServer(args.latency / 1000) as server:
+        print('%-18s %10s %10s %10s %10s %18s' % ('deadline', 'p50 ms', 'p99 ms', 'max ms', 'timeouts',
+                                                  'normal timed out'))
+        for deadline, executor in ((None, 'thread'), (args.deadline, 'thread'), (args.deadline, 'process')):
+            latencies, timeouts, collateral = run(server, args, deadline, executor)
+            name = 'none' if deadline is None else '%gs %s' % (deadline, executor)
+            print('%-18s %10.1f %10.1f %10.1f %10d %18d' % (name, percentile(latencies, 50) * 1000,
+                                                            percentile(latencies, 99) * 1000,
+                                                            max(latencies) * 1000, timeouts, collateral))
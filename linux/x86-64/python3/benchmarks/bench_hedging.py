@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Hedged identify requests against a local server with a long-tailed latency: most
+responses take --fast ms, a --tail-share of them --slow ms. Compares latency
+percentiles and requests sent with hedging off and on, from --threads callers.
+
+    >>> python benchmarks/bench_hedging.py --requests 400 --fast 10 --slow 400 --tail-share 0.05
+'''
+
+import time, argparse, threading
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context, percentile
+from acrcloud.recognizer import ACRCloudRecognizer
+from acrcloud.bench.emulator import ACRCloudTailLatency
+
+
+def run(re, requests, threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for _ in range(n):
+            started = time.perf_counter()
+            re.recognize_by_file('synthetic.mp3', 0)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--fast', type=float, default=10, help='ms')
+    parser.add_argument('--slow', type=float, default=400, help='ms')
+    parser.add_argument('--tail-share', type=float, default=0.05)
+    parser.add_argument('--percentile', type=float, default=90, help='hedge after this latency percentile')
+    parser.add_argument('--max-rate', type=float, default=0.15, help='hedges per request at most')
+    args = parser.parse_args()
+
+    latency = ACRCloudTailLatency(args.fast / 1000.0, args.slow / 1000.0, args.tail_share, seed=1)
+    with LocalIdentifyServer(latency) as server:
+        print('%-8s %10s %10s %10s %10s %12s' % ('hedge', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'server reqs'))
+        for hedge in (False, True):
+            re = ACRCloudRecognizer({'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                                     'ssl_context': client_ssl_context(), 'pool_max_per_host': 2 * args.threads,
+                                     'hedge': hedge, 'hedge_percentile': args.percentile,
+                                     'hedge_max_rate': args.max_rate})
+            server.requests = 0
+            latencies = run(re, args.requests, args.threads)
+            print('%-8s %10.1f %10.1f %10.1f %10.1f %12d' % (
+                'on' if hedge else 'off', percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+                percentile(latencies, 99) * 1000, max(latencies) * 1000, server.requests))
+            if hedge:
+                print(re.hedge_policy.stats())
+            re.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Multi-host routing against three local identify servers with different latencies.
+Phases: all healthy, the fastest host failing every request, the fastest host back.
+Reports where requests went, how many results were errors and the mean latency.
+
+    >>> python benchmarks/bench_host_routing.py --requests 200 --latencies 30,5,100
+'''
+
+import time, argparse, contextlib
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud.recognizer import ACRCloudRecognizer
+
+
+def phase(re, servers, name, requests):
+    for server in servers:
+        server.requests = 0
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        if re.recognize_by_file('synthetic.mp3', 0, parse=True).status_code != 0:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    print('%-16s %-24s %8d %12.1f' % (name, '/'.join(str(server.requests) for server in servers), errors,
+                                      elapsed / requests * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latencies', default='30,5,100', help='per-server latency in ms')
+    parser.add_argument('--open-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    latencies = [float(x) / 1000 for x in args.latencies.split(',')]
+    with contextlib.ExitStack() as stack:
+        servers = [stack.enter_context(LocalIdentifyServer(latency)) for latency in latencies]
+        re = ACRCloudRecognizer({'hosts': [server.host for server in servers], 'access_key': 'bench',
+                                 'access_secret': 'bench', 'ssl_context': client_ssl_context(),
+                                 'host_open_seconds': args.open_seconds})
+        fastest = servers[latencies.index(min(latencies))]
+
+        print('%-16s %-24s %8s %12s' % ('phase', 'requests per server', 'errors', 'mean ms'))
+        phase(re, servers, 'healthy', args.requests)
+        fastest.failures = 10 ** 9
+        phase(re, servers, 'fastest failing', args.requests)
+        fastest.failures = 0
+        time.sleep(args.open_seconds)
+        phase(re, servers, 'recovered', args.requests)
+        re.close()
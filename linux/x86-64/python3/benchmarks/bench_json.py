@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+loads/dumps throughput of each installed ACRCloudJson backend over a corpus of
+music-metadata identify responses shaped like real ones.
+
+    >>> python benchmarks/bench_json.py --responses 2000
+'''
+
+import time, random, argparse
+
+import _common
+from acrcloud.recognizer import ACRCloudJson
+
+
+def music_entry(rnd, i):
+    artist = 'Artist %d' % rnd.randint(1, 5000)
+    return {
+        'title': 'Track %d — %s' % (i, rnd.choice(['Remastered', 'Live', 'Radio Edit', 'Album Version'])),
+        'artists': [{'name': artist, 'langs': [{'code': 'en', 'name': artist}]}],
+        'album': {'name': 'Album %d' % rnd.randint(1, 20000)},
+        'label': 'Label %d' % rnd.randint(1, 500),
+        'release_date': '%04d-%02d-%02d' % (rnd.randint(1960, 2024), rnd.randint(1, 12), rnd.randint(1, 28)),
+        'genres': [{'name': g} for g in rnd.sample(['Pop', 'Rock', 'Jazz', 'Electronic', 'Hip Hop', 'Classical'], 2)],
+        'external_ids': {'isrc': 'US%s%07d' % (rnd.choice(['UM7', 'RC1', 'SM1']), rnd.randint(0, 9999999)),
+                         'upc': '%012d' % rnd.randint(0, 10 ** 12)},
+        'external_metadata': {
+            'spotify': {'track': {'id': '%022x' % rnd.getrandbits(88), 'name': 'Track %d' % i},
+                        'artists': [{'id': '%022x' % rnd.getrandbits(88), 'name': artist}],
+                        'album': {'id': '%022x' % rnd.getrandbits(88)}},
+            'deezer': {'track': {'id': str(rnd.randint(1, 10 ** 9))}, 'album': {'id': str(rnd.randint(1, 10 ** 8))}},
+            'youtube': {'vid': '%011x' % rnd.getrandbits(44)},
+        },
+        'acrid': '%032x' % rnd.getrandbits(128),
+        'result_from': 3,
+        'score': rnd.randint(70, 100),
+        'duration_ms': rnd.randint(120000, 420000),
+        'play_offset_ms': rnd.randint(0, 120000),
+        'sample_begin_time_offset_ms': 0,
+        'sample_end_time_offset_ms': 9500,
+        'db_begin_time_offset_ms': rnd.randint(0, 100000),
+        'db_end_time_offset_ms': rnd.randint(100000, 200000),
+    }
+
+
+def corpus(count, seed=7):
+    rnd = random.Random(seed)
+    responses = []
+    for i in range(count):
+        if rnd.random() < 0.3:
+            tree = {'status': {'msg': 'No result', 'code': 1001, 'version': '1.0'}}
+        else:
+            tree = {'status': {'msg': 'Success', 'code': 0, 'version': '1.0'},
+                    'metadata': {'timestamp_utc': '2024-01-01 00:00:00',
+                                 'music': [music_entry(rnd, i) for _ in range(rnd.randint(1, 3))]},
+                    'cost_time': round(rnd.random(), 3), 'result_type': 0}
+        responses.append(ACRCloudJson.get('json').dumps(tree))
+    return responses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--responses', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = corpus(args.responses)
+    trees = [ACRCloudJson.get('json').loads(text) for text in texts]
+    total_bytes = sum(len(text) for text in texts)
+    print('corpus: %d responses, %.1f KB average' % (len(texts), total_bytes / 1024.0 / len(texts)))
+    print('%-8s %14s %14s' % ('backend', 'loads/s', 'dumps/s'))
+    for name in ACRCloudJson.BACKENDS:
+        backend = ACRCloudJson(name)
+        if backend.name != name:
+            continue
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for text in texts:
+                backend.loads(text)
+        loads_rate = args.rounds * len(texts) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for tree in trees:
+                backend.dumps(tree)
+        dumps_rate = args.rounds * len(trees) / (time.perf_counter() - started)
+        print('%-8s %14.0f %14.0f' % (name, loads_rate, dumps_rate))
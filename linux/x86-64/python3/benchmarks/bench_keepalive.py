@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Compare identify throughput with and without the keep-alive connection pool.
+
+    >>> python benchmarks/bench_keepalive.py --requests 500 --threads 4
+'''
+
+import time, argparse, threading
+
+from _common import LocalIdentifyServer, client_ssl_context, percentile
+from acrcloud.recognizer import ACRCloudRecognizer
+
+
+def run(host, keep_alive, requests, threads):
+    re = ACRCloudRecognizer({
+        'host': host,
+        'access_key': 'bench',
+        'access_secret': 'bench',
+        'keep_alive': keep_alive,
+        'pool_max_per_host': threads,
+        'ssl_context': client_ssl_context(),
+    })
+    query_data = {'sample': b'\x01' * 1024}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        local = []
+        for _ in range(count):
+            t = time.perf_counter()
+            re.do_recogize(re.host, query_data, re.query_type, re.access_key, re.access_secret, re.timeout)
+            local.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    re.close()
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help='server think time in seconds')
+    args = parser.parse_args()
+
+    with LocalIdentifyServer(args.latency) as server:
+        print('%-12s %10s %10s %10s' % ('mode', 'req/s', 'p50 ms', 'p99 ms'))
+        for keep_alive in (False, True):
+            rps, p50, p99 = run(server.host, keep_alive, args.requests, args.threads)
+            print('%-12s %10.1f %10.2f %10.2f' % ('keep-alive' if keep_alive else 'urlopen',
+                                                  rps, p50 * 1000, p99 * 1000))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Peak RSS of recognizing a large media file: open(path, 'rb').read() followed by
+recognize_by_filebuffer (as in test.py) against recognize_by_mmap. Each mode runs in
+a fresh process so ru_maxrss is its own peak. The file is created sparse.
+
+    >>> python benchmarks/bench_mmap_rss.py --size-mb 2048
+'''
+
+import os, sys, time, resource, argparse, tempfile, subprocess
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud.recognizer import ACRCloudRecognizer
+
+
+def child(mode, path, host):
+    re = ACRCloudRecognizer({'host': host, 'access_key': 'bench', 'access_secret': 'bench',
+                             'ssl_context': client_ssl_context()})
+    started = time.perf_counter()
+    if mode == 'read':
+        buf = open(path, 'rb').read()
+        res = re.recognize_by_filebuffer(buf, 0, 10, parse=True)
+    else:
+        res = re.recognize_by_mmap(path, 0, 10, parse=True)
+    elapsed = time.perf_counter() - started
+    re.close()
+    # ru_maxrss is in kilobytes on Linux.
+    print('%d %f %d' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed, res.status_code))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=2048)
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'PATH', 'HOST'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        sys.exit(0)
+
+    fd, path = tempfile.mkstemp(suffix='.mp4', prefix='acrcloud-bench-')
+    try:
+        os.ftruncate(fd, args.size_mb << 20)
+        os.close(fd)
+        with LocalIdentifyServer() as server:
+            print('%-34s %14s %10s %8s' % ('mode (%d MB file)' % args.size_mb, 'peak RSS MB', 'wall s', 'status'))
+            for mode, name in (('read', 'read() + recognize_by_filebuffer'), ('mmap', 'recognize_by_mmap')):
+                out = subprocess.check_output([sys.executable, os.path.realpath(__file__), '--child', mode, path,
+                                               server.host])
+                rss_kb, elapsed, status = out.split()
+                print('%-34s %14.1f %10.3f %8s' % (name, int(rss_kb) / 1024.0, float(elapsed), status.decode()))
+    finally:
+        os.unlink(path)
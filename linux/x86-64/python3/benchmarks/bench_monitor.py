@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Load test of ChannelMonitor: many synthetic PCM channels on one event loop, the stub
+extractor and a local identify server. Reports identify throughput, the lag between a
+window completing and its event, peak RSS and the connections used.
+
+    >>> python benchmarks/bench_monitor.py --channels 500 --seconds 60 --speed 20
+'''
+
+import time, asyncio, argparse, resource
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context, percentile
+from acrcloud.monitor import ChannelMonitor
+
+
+class SyntheticSource:
+    '''seconds of PCM delivered one second at a time, speed times faster than real time.'''
+
+    def __init__(self, seconds, speed, completed):
+        self.seconds = seconds
+        self.speed = speed
+        self.completed = completed
+
+    async def __aiter__(self):
+        second = stub._pcm(1)
+        for i in range(self.seconds):
+            await asyncio.sleep(1.0 / self.speed)
+            self.completed[i + 1] = time.perf_counter()
+            yield second
+
+
+async def main(args, host):
+    config = {'host': host, 'access_key': 'bench', 'access_secret': 'bench', 'ssl_context': client_ssl_context(),
+              'pool_max_per_host': args.connections, 'max_concurrency': args.connections * 2}
+    monitor = ChannelMonitor(config, window=args.window, hop=args.window, fingerprint_workers=args.workers)
+    completed = {}
+    for i in range(args.channels):
+        completed[i] = {}
+        monitor.add_channel(i, SyntheticSource(args.seconds, args.speed, completed[i]))
+
+    lags = []
+    started = time.perf_counter()
+    runner = asyncio.ensure_future(monitor.run())
+    async for event in monitor.events():
+        window_end = completed[event.channel_id][event.start_seconds + args.window]
+        lags.append(time.perf_counter() - window_end)
+    await runner
+    elapsed = time.perf_counter() - started
+    return len(lags), elapsed, lags, len(monitor.errors)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--channels', type=int, default=500)
+    parser.add_argument('--seconds', type=int, default=60, help='audio seconds per channel')
+    parser.add_argument('--speed', type=float, default=20, help='faster-than-real-time factor')
+    parser.add_argument('--window', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.01, help='server think time in seconds')
+    args = parser.parse_args()
+
+    stub.configure(fingerprint_cost=1e-4)
+    with LocalIdentifyServer(args.latency) as server:
+        events, elapsed, lags, errors = asyncio.run(main(args, server.host))
+    print('channels            %d' % args.channels)
+    print('events              %d (%d channel errors)' % (events, errors))
+    print('identify/s          %.1f' % (events / elapsed))
+    print('event lag p50/p99   %.1f / %.1f ms' % (percentile(lags, 50) * 1000, percentile(lags, 99) * 1000))
+    print('peak RSS            %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+    print('connections         <= %d' % args.connections)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Memory and throughput of the multipart body: the old concatenating encoder versus
+ACRCloudMultipartEncoder, for 1 KB fingerprints and 1 MB PCM payloads.
+
+    >>> python benchmarks/bench_multipart.py
+'''
+
+import time, tracemalloc
+
+import _common
+from acrcloud.recognizer import ACRCloudMultipartEncoder
+
+FIELDS = {'access_key': 'XXXXXXXX', 'sample_bytes': '1024', 'timestamp': '1464307200',
+          'signature': 'c2lnbmF0dXJlc2lnbmF0dXJlc2lnbmF0dXJl', 'data_type': 'fingerprint',
+          'signature_version': '1'}
+
+
+def concat_encoder(fields, files):
+    # the encoder recognizer.py used before ACRCloudMultipartEncoder, kept for comparison.
+    boundary = "*****2016.05.27.acrcloud.rec.copyright." + str(time.time()) + "*****"
+    CRLF = '\r\n'
+    L = []
+    for (key, value) in list(fields.items()):
+        L.append('--' + boundary)
+        L.append('Content-Disposition: form-data; name="%s"' % key)
+        L.append('')
+        L.append(value)
+    body = bytes(CRLF.join(L), encoding='utf-8')
+    for (key, value) in list(files.items()):
+        L = []
+        L.append(CRLF + '--' + boundary)
+        L.append('Content-Disposition: form-data; name="%s"; filename="%s"' % (key, key))
+        L.append('Content-Type: application/octet-stream')
+        L.append(CRLF)
+        body = body + CRLF.join(L).encode('ascii') + value
+    body = body + (CRLF + '--' + boundary + '--' + CRLF + CRLF).encode('ascii')
+    return body
+
+
+def segment_encoder(fields, files):
+    return ACRCloudMultipartEncoder(fields, files)
+
+
+def measure(encode, files, rounds):
+    tracemalloc.start()
+    encode(FIELDS, files)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode(FIELDS, files)
+    elapsed = time.perf_counter() - started
+    return peak, rounds / elapsed
+
+
+if __name__ == '__main__':
+    cases = [
+        ('1 KB fingerprint', {'sample': b'\x01' * 1024}, 20000),
+        ('1 KB + 1 KB humming', {'sample': b'\x01' * 1024, 'sample_hum': b'\x02' * 1024}, 20000),
+        ('1 MB PCM', {'sample': b'\x01' * (1 << 20)}, 500),
+        ('1 MB + 1 MB humming', {'sample': b'\x01' * (1 << 20), 'sample_hum': b'\x02' * (1 << 20)}, 500),
+    ]
+    print('%-22s %-10s %14s %14s' % ('payload', 'encoder', 'peak bytes', 'encodes/s'))
+    for name, files, rounds in cases:
+        for label, encode in (('concat', concat_encoder), ('segments', segment_encoder)):
+            peak, rate = measure(encode, files, rounds)
+            print('%-22s %-10s %14d %14.0f' % (name, label, peak, rate))
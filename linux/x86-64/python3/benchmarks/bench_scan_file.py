@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Whole-file scanning: the README loop (recognize_by_file per window, which decodes
+from the start of the file every time) versus scan_file (decode once, slice windows).
+Runs on a synthetic recording with the stub extractor and a local identify server.
+
+    >>> python benchmarks/bench_scan_file.py --hours 2 --step 10
+'''
+
+import time, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud.recognizer import ACRCloudRecognizer
+
+
+def readme_loop(re, step, rec_length):
+    filepath = 'synthetic.mp3'
+    duration_ms = int(re.get_duration_ms_by_file(filepath))
+    for i in range(0, duration_ms // 1000, step):
+        re.recognize_by_file(filepath, i, rec_length)
+
+
+def scan_file(re, step, rec_length):
+    for _ in re.scan_file('synthetic.mp3', step, rec_length):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=2)
+    parser.add_argument('--step', type=int, default=10)
+    parser.add_argument('--length', type=int, default=10)
+    parser.add_argument('--decode-cost', type=float, default=5e-6,
+                        help='stub CPU seconds per second of audio decoded')
+    parser.add_argument('--fingerprint-cost', type=float, default=1e-4,
+                        help='stub CPU seconds per second of audio fingerprinted')
+    args = parser.parse_args()
+
+    stub.configure(duration_seconds=int(args.hours * 3600), decode_cost=args.decode_cost,
+                   fingerprint_cost=args.fingerprint_cost)
+    with LocalIdentifyServer() as server:
+        re = ACRCloudRecognizer({'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+                                 'ssl_context': client_ssl_context()})
+        print('%-12s %10s %18s %10s' % ('mode', 'windows', 'decoded seconds', 'wall s'))
+        for name, run in (('README loop', readme_loop), ('scan_file', scan_file)):
+            stub.reset()
+            started = time.perf_counter()
+            run(re, args.step, args.length)
+            elapsed = time.perf_counter() - started
+            print('%-12s %10d %18.0f %10.2f' % (name, stub.counters['calls'], stub.counters['decoded_seconds'],
+                                               elapsed))
+        re.close()
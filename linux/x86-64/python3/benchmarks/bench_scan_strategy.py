@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+scan_file strategies on a simulated broadcast: identify calls made, tracks found and
+how closely the track boundaries were located, against the exhaustive 'fixed' scan.
+
+The recording is a playlist of tracks separated by short talk breaks. The stub decoder
+stamps every sample with the second it belongs to, and identify is answered locally
+from the playlist (score 100 inside a track, no result in a break, the majority track
+at a lower score across a boundary), so only the scheduling differs between runs.
+--short-edits is the fraction of tracks played as an edit shorter than the duration
+the catalogue reports for them (the case where a skip_matched probe fails).
+The whole recording is held as 8000 Hz PCM (57.6 MB per hour) and stamped with 16 bit
+second numbers, so --hours is limited to 9.
+
+    >>> python benchmarks/bench_scan_strategy.py --hours 2 --step 10 --coarse-steps 60,120 --precisions 10,2 \
+    ...     --short-edits 0.25
+'''
+
+import array, random, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudJson, ACRCloudScanSummary
+
+
+def make_playlist(total_seconds, seed, short_edits=0.0):
+    # (start, seconds played, acrid, catalogue duration)
+    rnd = random.Random(seed)
+    playlist, position, n = [], 0, 0
+    while position < total_seconds:
+        position += rnd.choice((0, 0, 5, 30))  # talk break
+        catalogue = rnd.randint(150, 330)
+        duration = catalogue - rnd.randint(30, 90) if rnd.random() < short_edits else catalogue
+        playlist.append((position, duration, '%032x' % n, catalogue))
+        position += duration
+        n += 1
+    return playlist
+
+
+def stamped_decode(file_name, start_time_seconds, audio_len_seconds, *args):
+    seconds = stub.duration_seconds
+    samples = array.array('h')
+    for second in range(seconds):
+        samples.extend(array.array('h', [second]) * 8000)
+    return samples.tobytes()
+
+
+class PlaylistRecognizer(ACRCloudRecognizer):
+    def __init__(self, config, playlist):
+        ACRCloudRecognizer.__init__(self, config)
+        self.playlist = playlist
+
+    def recognize(self, wav_audio_buffer, user_params=None, parse=False):
+        samples = memoryview(wav_audio_buffer).cast('h')
+        start, end = samples[0], samples[-1] + 1
+        best, overlap = None, 0
+        for track_start, duration, acrid, catalogue in self.playlist:
+            covered = min(end, track_start + duration) - max(start, track_start)
+            if covered > overlap:
+                best, overlap = (track_start, duration, acrid, catalogue), covered
+        if best is None or overlap < 3:
+            res = {'status': {'msg': 'No result', 'code': 1001, 'version': '1.0'}}
+        else:
+            track_start, duration, acrid, catalogue = best
+            score = 100 if overlap == end - start else 60
+            res = {'status': {'msg': 'Success', 'code': 0, 'version': '1.0'},
+                   'metadata': {'music': [{'acrid': acrid, 'title': acrid, 'score': score,
+                                           'duration_ms': catalogue * 1000,
+                                           'play_offset_ms': min(end - track_start, duration) * 1000}]}}
+        return self.check_result(ACRCloudJson.get().dumps(res), parse)
+
+
+def boundary_error(playlist, results, rec_length):
+    # a label change between windows at t1 and t2 puts the boundary near their midpoint,
+    # shifted by half a window (a window is labelled by the track covering most of it).
+    estimates = []
+    for (t1, r1), (t2, r2) in zip(results, results[1:]):
+        if label(r1) != label(r2):
+            estimates.append((t1 + t2) / 2.0 + rec_length / 2.0)
+    errors = [min([abs(e - track_start) for e in estimates] or [float('inf')])
+              for track_start, _, _, _ in playlist[1:]]
+    return sum(errors) / len(errors), max(errors)
+
+
+def label(res):
+    return res.top_match.acrid if res.is_match else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=2)
+    parser.add_argument('--step', type=int, default=10)
+    parser.add_argument('--length', type=int, default=10)
+    parser.add_argument('--coarse-steps', default='60,120')
+    parser.add_argument('--precisions', default='10,2')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--short-edits', type=float, default=0.25)
+    args = parser.parse_args()
+    if args.hours > 9:
+        parser.error('--hours must be at most 9')
+
+    stub.configure(duration_seconds=int(args.hours * 3600))
+    stub.decode_audio_by_file = stamped_decode
+    playlist = make_playlist(stub.duration_seconds, args.seed, args.short_edits)
+    re = PlaylistRecognizer({'access_key': 'bench', 'access_secret': 'bench'}, playlist)
+
+    runs = [('fixed', {}), ('skip_matched', {})]
+    for coarse_step in [int(x) for x in args.coarse_steps.split(',')]:
+        for precision in [float(x) for x in args.precisions.split(',')]:
+            runs.append(('coarse_to_fine', {'coarse_step': coarse_step, 'precision': precision}))
+
+    print('%d tracks (%d short edits) in %.1f hours, exhaustive step %ds' % (
+        len(playlist), sum(1 for track in playlist if track[1] < track[3]), args.hours, args.step))
+    print('%-44s %14s %12s %8s %16s %15s' % ('strategy', 'identify calls', 'calls saved', 'tracks',
+                                            'mean boundary s', 'max boundary s'))
+    for strategy, options in runs:
+        summary = ACRCloudScanSummary()
+        results = list(re.scan_file('synthetic.mp3', args.step, args.length, parse=True, strategy=strategy,
+                                    summary=summary, **options))
+        starts = [start for start, _ in results]
+        assert starts == sorted(starts) and len(set(starts)) == len(starts), strategy + ': windows out of order'
+        found = set(label(res) for _, res in results) - set([None])
+        mean_error, max_error = boundary_error(playlist, results, args.length)
+        name = strategy + ''.join(' %s=%g' % item for item in sorted(options.items()))
+        print('%-44s %14d %12d %8d %16.1f %15.1f' % (name, summary.identify_calls, summary.calls_saved, len(found),
+                                                    mean_error, max_error))
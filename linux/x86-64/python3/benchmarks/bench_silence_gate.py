@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Silence gate: scan a synthetic recording in which part of the windows are near-silent,
+with and without silence_gate, and count fingerprints created and identify requests
+sent. Also times the gate itself per 10 s window (NumPy when installed, array module
+otherwise).
+
+    >>> python benchmarks/bench_silence_gate.py --minutes 30 --silent-share 0.3
+'''
+
+import time, array, random, argparse
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud import recognizer as acr
+
+
+def noisy_pcm(seconds, rnd, amplitude):
+    samples = [rnd.randint(-amplitude, amplitude) for _ in range(8000)]
+    second = array.array('h', samples).tobytes()
+    return second * int(seconds)
+
+
+def make_decoder(total_seconds, silent_share, seed):
+    rnd = random.Random(seed)
+    loud, quiet = noisy_pcm(10, rnd, 8000), noisy_pcm(10, rnd, 20)
+    pcm = b''.join(quiet if rnd.random() < silent_share else loud for _ in range(total_seconds // 10))
+
+    def decode_audio_by_file(file_name, start_time_seconds, audio_len_seconds, *args):
+        return pcm
+    return decode_audio_by_file
+
+
+def scan(server, gate):
+    config = {'host': server.host, 'access_key': 'bench', 'access_secret': 'bench',
+              'ssl_context': client_ssl_context(), 'silence_gate': gate}
+    re = acr.ACRCloudRecognizer(config)
+    server.requests = 0
+    stub.reset()
+    started = time.perf_counter()
+    for _ in re.scan_file('synthetic.mp3', 10, 10):
+        pass
+    elapsed = time.perf_counter() - started
+    re.close()
+    return stub.counters['calls'], server.requests, elapsed, re.silence_gate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=int, default=30)
+    parser.add_argument('--silent-share', type=float, default=0.3)
+    parser.add_argument('--fingerprint-cost', type=float, default=5e-3,
+                        help='stub CPU seconds per second of audio fingerprinted')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stub.configure(duration_seconds=args.minutes * 60, fingerprint_cost=args.fingerprint_cost)
+    stub.decode_audio_by_file = make_decoder(args.minutes * 60, args.silent_share, args.seed)
+
+    gate = acr.ACRCloudSilenceGate()
+    window = noisy_pcm(10, random.Random(args.seed), 8000)
+    started = time.perf_counter()
+    for _ in range(20):
+        gate.is_silent(window)
+    print('gate backend %s: %.2f ms per 10 s window' % ('numpy' if acr.numpy is not None else 'array',
+                                                        (time.perf_counter() - started) / 20 * 1000))
+
+    with LocalIdentifyServer() as server:
+        print('%-10s %14s %10s %10s %16s' % ('gate', 'fingerprints', 'requests', 'wall s', 'skipped windows'))
+        for enabled in (False, True):
+            fingerprints, requests, elapsed, used = scan(server, enabled)
+            skipped = used.stats()['skipped_windows'] if used is not None else 0
+            print('%-10s %14d %10d %10.2f %16d' % ('on' if enabled else 'off', fingerprints, requests, elapsed,
+                                                   skipped))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+'''
+Single-flight coalescing: feeds simulcast on several channels each, so every window of
+a feed (10 seconds of one file) is identified by all of its channels at about the same
+time. Runs the channels as threads on one ACRCloudRecognizer and as tasks on one
+AsyncACRCloudRecognizer, with and without single_flight, and reports the requests the
+identify server received.
+
+    >>> python benchmarks/bench_single_flight.py --feeds 10 --copies 5 --windows 20
+'''
+
+import time, asyncio, argparse, threading
+
+import _common
+stub = _common.use_stub_extr_tool()
+
+from _common import LocalIdentifyServer, client_ssl_context
+from acrcloud.recognizer import ACRCloudRecognizer
+from acrcloud.async_recognizer import AsyncACRCloudRecognizer
+
+
+def feed_file(feed):
+    # the stub decodes every window of every file to different audio.
+    return 'feed-%d.mp3' % feed
+
+
+def config(host, single_flight):
+    return {'host': host, 'access_key': 'bench', 'access_secret': 'bench', 'ssl_context': client_ssl_context(),
+            'single_flight': single_flight}
+
+
+def run_threads(host, args, single_flight):
+    re = ACRCloudRecognizer(config(host, single_flight))
+    barrier = threading.Barrier(args.feeds * args.copies)
+    errors = []
+
+    def channel(feed):
+        for window in range(args.windows):
+            barrier.wait()
+            if re.recognize_by_file(feed_file(feed), window * 10, parse=True).status_code != 0:
+                errors.append(window)
+
+    threads = [threading.Thread(target=channel, args=(feed,)) for feed in range(args.feeds)
+               for _ in range(args.copies)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    re.close()
+    return len(errors), re.single_flight
+
+
+async def run_tasks(host, args, single_flight):
+    re = AsyncACRCloudRecognizer(config(host, single_flight))
+    errors = 0
+    for window in range(args.windows):
+        results = await asyncio.gather(*[re.recognize_by_file(feed_file(feed), window * 10, parse=True)
+                                         for feed in range(args.feeds) for _ in range(args.copies)])
+        errors += sum(1 for res in results if res.status_code != 0)
+    await re.close()
+    return errors, re.recognizer.single_flight
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--feeds', type=int, default=10)
+    parser.add_argument('--copies', type=int, default=5, help='channels carrying each feed')
+    parser.add_argument('--windows', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=50, help='server latency in ms')
+    args = parser.parse_args()
+
+    calls = args.feeds * args.copies * args.windows
+    with LocalIdentifyServer(args.latency / 1000) as server:
+        print('%-8s %-14s %10s %10s %8s %10s %10s' % ('mode', 'single_flight', 'identifies', 'requests', 'errors',
+                                                      'coalesced', 'wall s'))
+        for mode in ('threads', 'asyncio'):
+            for enabled in (False, True):
+                server.requests = 0
+                started = time.perf_counter()
+                if mode == 'threads':
+                    errors, flight = run_threads(server.host, args, enabled)
+                else:
+                    errors, flight = asyncio.run(run_tasks(server.host, args, enabled))
+                elapsed = time.perf_counter() - started
+                ratio = flight.stats()['coalescing_ratio'] if flight is not None else 0.0
+                print('%-8s %-14s %10d %10d %8d %9.1f%% %10.2f' % (mode, 'on' if enabled else 'off', calls,
+                                                                  server.requests, errors, ratio * 100, elapsed))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, sys, json, time, hashlib, threading
+import http.server
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+# before acrcloud.recognizer is first imported; worker processes inherit it.
+os.environ['ACRCLOUD_EXTR_TOOL'] = 'stub'
+
+from acrcloud.bench import extr_tool_stub
+from acrcloud.bench.emulator import ACRCloudIdentifyEmulator, client_ssl_context
+
+'''
+Fixtures shared by the test suite: the fingerprinting stub from acrcloud.bench, the
+identify emulator and a plain HTTP server that counts connections. Nothing here needs
+the native acrcloud_extr_tool or the network.
+'''
+
+ACCESS_KEY = 'test'
+ACCESS_SECRET = 'test'
+
+
+def status_code(res):
+    return json.loads(res)['status']['code']
+
+
+def pcm_seconds(seconds, seed=b'pcm'):
+    # loud enough for any silence threshold, and different for every seed.
+    return hashlib.shake_128(seed).digest(int(seconds * 16000))
+
+
+@pytest.fixture
+def stub():
+    settings = extr_tool_stub.settings()
+    extr_tool_stub.reset()
+    yield extr_tool_stub
+    extr_tool_stub.configure(**settings)
+
+
+@pytest.fixture
+def emulator():
+    '''Starts identify emulators: emulator(latency=0.0, **kwargs). All are stopped after the test.'''
+    servers = []
+
+    def start(latency=0.0, **kwargs):
+        kwargs.setdefault('access_keys', {ACCESS_KEY: ACCESS_SECRET})
+        server = ACRCloudIdentifyEmulator(latency, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def server(emulator):
+    return emulator()
+
+
+@pytest.fixture
+def make_config():
+    '''make_config(*servers, **config): a recognizer config for the given emulators.'''
+    def make(*servers, **config):
+        base = {'access_key': ACCESS_KEY, 'access_secret': ACCESS_SECRET, 'timeout': 5,
+                'ssl_context': client_ssl_context()}
+        if len(servers) == 1:
+            base['host'] = servers[0].host
+        elif servers:
+            base['hosts'] = [server.host for server in servers]
+        base.update(config)
+        return base
+    return make
+
+
+class _CountingHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+        # closing without "Connection: close" is what a server timing out an idle
+        # keep-alive connection looks like to the client.
+        self.close_connection = self.server.close_after_response
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingHTTPServer(http.server.ThreadingHTTPServer):
+    '''Plain HTTP server answering every POST with "ok"; counts connections and requests.'''
+
+    daemon_threads = True
+
+    def __init__(self, close_after_response=False, delay=0.0):
+        http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), _CountingHandler)
+        self.close_after_response = close_after_response
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.url = 'http://127.0.0.1:%d/v1/identify' % self.server_address[1]
+
+
+@pytest.fixture
+def http_server():
+    '''Starts plain HTTP servers: http_server(close_after_response=False, delay=0.0).'''
+    servers = []
+
+    def start(close_after_response=False, delay=0.0):
+        server = CountingHTTPServer(close_after_response, delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
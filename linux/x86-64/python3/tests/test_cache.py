@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import asyncio, threading
+
+from conftest import status_code, pcm_seconds
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudFingerprintCache, ACRCloudSingleFlight
+from acrcloud.async_recognizer import AsyncACRCloudRecognizer
+
+
+def test_fingerprint_cache_skips_second_decode(stub, server, make_config, tmp_path):
+    # the cache hashes the file's content; the stub decodes whatever it is.
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(pcm_seconds(1))
+    path = str(path)
+    re = ACRCloudRecognizer(make_config(server, fingerprint_cache_size=1 << 20))
+    assert status_code(re.recognize_by_file(path, 30, 10)) == 0
+    decoded = stub.counters['decoded_seconds']
+    assert status_code(re.recognize_by_file(path, 30, 10)) == 0
+    assert stub.counters['decoded_seconds'] == decoded
+    assert status_code(re.recognize_by_file(path, 40, 10)) == 0
+    assert stub.counters['decoded_seconds'] > decoded
+    stats = re.fingerprint_cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+    re.close()
+
+
+def test_fingerprint_cache_on_disk_outlives_recognizer(stub, server, make_config, tmp_path):
+    path = str(tmp_path / 'fingerprints.sqlite')
+    re = ACRCloudRecognizer(make_config(server, fingerprint_cache_path=path))
+    buf = pcm_seconds(30)
+    first = re.create_query_data_by_filebuffer(buf, 0, 10)
+    re.close()
+
+    re = ACRCloudRecognizer(make_config(server, fingerprint_cache_path=path))
+    decoded = stub.counters['decoded_seconds']
+    assert re.create_query_data_by_filebuffer(buf, 0, 10) == first
+    assert stub.counters['decoded_seconds'] == decoded
+    assert re.fingerprint_cache.stats()['disk_hits'] == 1
+    re.close()
+
+
+def test_fingerprint_cache_key_covers_backend_and_options():
+    key = ACRCloudFingerprintCache.key
+    base = key('1.0', 'digest', 0, 10, 0, {'filter_energy_min': 0})
+    assert base == key('1.0', 'digest', 0, 10, 0, {'filter_energy_min': 0})
+    assert base != key('1.1', 'digest', 0, 10, 0, {'filter_energy_min': 0})
+    assert base != key('1.0', 'digest', 0, 10, 0, {'filter_energy_min': 1})
+    assert base != key('1.0', 'digest', 10, 10, 0, {'filter_energy_min': 0})
+
+
+def test_fingerprint_cache_does_not_keep_failures():
+    cache = ACRCloudFingerprintCache()
+    cache.put('key', {'sample': b''})
+    assert cache.get('key') is None
+
+
+def test_response_cache_answers_repeated_request(stub, server, make_config):
+    re = ACRCloudRecognizer(make_config(server, response_cache_size=16))
+    pcm = pcm_seconds(10)
+    assert re.recognize(pcm) == re.recognize(pcm)
+    assert server.requests == 1
+    assert status_code(re.recognize(pcm_seconds(10, b'other'))) == 0
+    assert server.requests == 2
+    re.close()
+
+
+def test_response_cache_does_not_keep_errors(stub, server, make_config):
+    re = ACRCloudRecognizer(make_config(server, response_cache_size=16))
+    pcm = pcm_seconds(10)
+    server.failures = 1
+    server.fail_status = 400
+    assert status_code(re.recognize(pcm)) != 0
+    assert status_code(re.recognize(pcm)) == 0
+    assert server.requests == 2
+    re.close()
+
+
+def test_single_flight_coalesces_concurrent_threads(stub, emulator, make_config):
+    server = emulator(latency=0.3)
+    flight = ACRCloudSingleFlight()
+    re = ACRCloudRecognizer(make_config(server, single_flight=flight))
+    pcm = pcm_seconds(10)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(re.recognize(pcm))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1 and status_code(results[0]) == 0
+    assert server.requests == 1
+    assert flight.stats()['coalesced'] == 3
+    re.close()
+
+
+def test_single_flight_coalesces_concurrent_tasks(stub, emulator, make_config):
+    server = emulator(latency=0.3)
+
+    async def run():
+        are = AsyncACRCloudRecognizer(make_config(server, single_flight=True))
+        pcm = pcm_seconds(10)
+        results = await asyncio.gather(*[are.recognize(pcm) for _ in range(4)])
+        await are.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(set(results)) == 1 and status_code(results[0]) == 0
+    assert server.requests == 1
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os, json, time, asyncio, itertools, threading
+
+import pytest
+
+from conftest import status_code, pcm_seconds
+from acrcloud.recognizer import (ACRCloudRecognizer, ACRCloudStatusCode, ACRCloudRetryBudget, ACRCloudHostRouter,
+                                 ACRCloudRateLimiter)
+from acrcloud.async_recognizer import AsyncACRCloudRecognizer
+
+
+def retry_config(make_config, server, attempts, budget=None, **config):
+    return make_config(server, retry_max_attempts=attempts, retry_backoff_base=0,
+                       retry_budget=budget or ACRCloudRetryBudget(), **config)
+
+
+def test_retry_succeeds_after_server_errors(stub, server, make_config):
+    re = ACRCloudRecognizer(retry_config(make_config, server, 3))
+    server.failures = 2
+    res = re.recognize(pcm_seconds(10))
+    assert status_code(res) == 0
+    assert json.loads(res)['attempts'] == 3
+    assert server.requests == 3
+    re.close()
+
+
+def test_retry_gives_up_after_max_attempts(stub, server, make_config):
+    re = ACRCloudRecognizer(retry_config(make_config, server, 2))
+    server.failures = 5
+    assert status_code(re.recognize(pcm_seconds(10))) == ACRCloudStatusCode.HTTP_ERROR_CODE
+    assert server.requests == 2
+    re.close()
+
+
+def test_client_errors_are_not_retried(stub, server, make_config):
+    re = ACRCloudRecognizer(retry_config(make_config, server, 3))
+    server.failures = 1
+    server.fail_status = 400
+    assert status_code(re.recognize(pcm_seconds(10))) == ACRCloudStatusCode.HTTP_ERROR_CODE
+    assert server.requests == 1
+    re.close()
+
+
+def test_retry_budget_caps_retries(stub, server, make_config):
+    budget = ACRCloudRetryBudget(ratio=0, min_per_second=0, max_tokens=1)
+    re = ACRCloudRecognizer(retry_config(make_config, server, 3, budget))
+    server.failures = 10
+    re.recognize(pcm_seconds(10))
+    re.recognize(pcm_seconds(10))
+    # one token: the first request retries once, then neither may retry again.
+    assert server.requests == 3
+    assert budget.stats()['retries'] == 1
+    assert budget.stats()['exhausted'] == 2
+    re.close()
+
+
+def test_failing_host_fails_over_and_opens_its_circuit(stub, emulator, make_config):
+    bad, good = emulator(), emulator()
+    router = ACRCloudHostRouter([bad.host, good.host], failure_threshold=2, open_seconds=0.3, explore=0)
+    re = ACRCloudRecognizer(make_config(host_router=router))
+    bad.failures = 100
+    for _ in range(5):
+        assert status_code(re.recognize(pcm_seconds(10))) == 0
+    assert bad.requests == 2
+    assert good.requests == 5
+    assert router.stats()[bad.host]['open']
+
+    # after open_seconds one probe goes to the recovered host and closes the circuit.
+    bad.failures = 0
+    time.sleep(0.35)
+    assert status_code(re.recognize(pcm_seconds(10))) == 0
+    assert bad.requests == 3
+    stats = router.stats()[bad.host]
+    assert not stats['open'] and stats['failures'] == 0
+    re.close()
+
+
+def slow_first_response(seconds):
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def latency():
+        with lock:
+            return seconds if next(counter) == 0 else 0.0
+    return latency
+
+
+def test_hedged_request_wins_over_slow_first(stub, emulator, make_config):
+    server = emulator(latency=slow_first_response(2.0))
+    re = ACRCloudRecognizer(make_config(server, hedge=True, hedge_delay=0.1, hedge_max_rate=1.0))
+    started = time.monotonic()
+    assert status_code(re.recognize(pcm_seconds(10))) == 0
+    assert time.monotonic() - started < 1.0
+    assert server.requests == 2
+    assert re.hedge_policy.stats()['hedge_wins'] == 1
+    re.close()
+
+
+def test_hedging_needs_keep_alive(stub, server, make_config):
+    with pytest.raises(ValueError):
+        ACRCloudRecognizer(make_config(server, hedge=True, keep_alive=False))
+
+
+def test_async_hedged_request_wins_over_slow_first(stub, emulator, make_config):
+    server = emulator(latency=slow_first_response(2.0))
+
+    async def run():
+        are = AsyncACRCloudRecognizer(make_config(server, hedge=True, hedge_delay=0.1, hedge_max_rate=1.0))
+        started = time.monotonic()
+        res = await are.recognize(pcm_seconds(10))
+        elapsed = time.monotonic() - started
+        await are.close()
+        return res, elapsed, are.recognizer.hedge_policy.stats()
+
+    res, elapsed, stats = asyncio.run(run())
+    assert status_code(res) == 0
+    assert elapsed < 1.0
+    assert stats['hedge_wins'] == 1
+
+
+def test_async_hedge_cancelled_with_caller(stub, emulator, make_config):
+    server = emulator(latency=1.0)
+
+    async def run():
+        are = AsyncACRCloudRecognizer(make_config(server, hedge=True, hedge_delay=0.5))
+        call = asyncio.ensure_future(are.recognize(pcm_seconds(10)))
+        await asyncio.sleep(0.2)
+        call.cancel()
+        await asyncio.sleep(0.1)
+        left = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await are.close()
+        return left
+
+    assert asyncio.run(run()) == []
+
+
+def test_deadline_abandons_stuck_decode_in_thread(stub, server, make_config, monkeypatch):
+    # sleeping rather than burning CPU, so the stuck threads leave the GIL to the test.
+    monkeypatch.setattr(stub, '_burn', time.sleep)
+    stub.configure(stall_files=('stuck.mp3',), stall_seconds=3)
+    re = ACRCloudRecognizer(make_config(server, deadline_workers=2))
+    for _ in range(3):
+        started = time.monotonic()
+        res = re.recognize_by_file('stuck.mp3', 0, deadline=0.2)
+        assert status_code(res) == ACRCloudStatusCode.TIMEOUT_ERROR_CODE
+        assert time.monotonic() - started < 1.0
+    # abandoned workers do not hold up later calls.
+    assert status_code(re.recognize_by_file('good.mp3', 0, deadline=1.0)) == 0
+    re.close()
+
+
+def test_deadline_kills_stuck_decode_in_process(stub, server, make_config):
+    stub.configure(stall_files=('stuck.mp3',), stall_seconds=30)
+    re = ACRCloudRecognizer(make_config(server, deadline_executor='process', deadline_workers=1))
+    started = time.monotonic()
+    res = re.recognize_by_file('stuck.mp3', 0, deadline=0.5)
+    assert status_code(res) == ACRCloudStatusCode.TIMEOUT_ERROR_CODE
+    assert time.monotonic() - started < 2.0
+    assert status_code(re.recognize_by_file('good.mp3', 0, deadline=5.0)) == 0
+    re.close()
+
+
+def test_file_rate_limiter_is_shared_with_forked_children(tmp_path):
+    limiter = ACRCloudRateLimiter(20, 1, str(tmp_path / 'bucket'))
+    limiter.take()
+    read, write = os.pipe()
+    children = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            taken, end = 0, time.monotonic() + 0.5
+            while time.monotonic() < end:
+                taken += limiter.take() == 0
+            os.write(write, b'%d\n' % taken)
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+    os.close(write)
+    taken = sum(int(line) for line in os.read(read, 1024).split())
+    os.close(read)
+    limiter.close()
+    # 20 per second over half a second, whichever process takes them.
+    assert 8 <= taken <= 13
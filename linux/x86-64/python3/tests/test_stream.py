@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import array, random
+
+import pytest
+
+from conftest import status_code, pcm_seconds
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudPCMRingBuffer, ACRCloudJson, ACRCloudScanSummary
+
+
+def chunked(data, seed, largest):
+    rnd = random.Random(seed)
+    offset = 0
+    while offset < len(data):
+        size = rnd.randint(1, largest)
+        yield data[offset:offset + size]
+        offset += size
+
+
+def expected_windows(stream, window, hop):
+    bps = 16000
+    return [(start // bps if start % bps == 0 else start / float(bps), stream[start:start + window * bps])
+            for start in range(0, len(stream) - window * bps + 1, int(hop * bps))]
+
+
+@pytest.mark.parametrize('window,hop', [(3, 1), (3, 3), (2, 5), (2, 0.5)])
+@pytest.mark.parametrize('largest', [7, 16000, 200000])
+def test_ring_buffer_cuts_windows_from_any_chunking(window, hop, largest):
+    stream = pcm_seconds(20)
+    ring = ACRCloudPCMRingBuffer.for_windows(window, hop)
+    windows = []
+    for chunk in chunked(stream, largest, largest):
+        for start_seconds, view in ring.feed(chunk):
+            windows.append((start_seconds, bytes(view)))
+    assert windows == expected_windows(stream, window, hop)
+
+
+def test_ring_buffer_windows_match_whole_buffer_windows():
+    stream = pcm_seconds(30)
+    ring = ACRCloudPCMRingBuffer.for_windows(10, 10)
+    fed = [(start, bytes(view)) for start, view in ring.feed(stream)]
+    whole = [(start, bytes(pcm)) for start, pcm in ACRCloudRecognizer.iter_pcm_windows(stream, 10, 10)]
+    assert fed == whole
+
+
+def test_recognize_stream_yields_one_result_per_window(stub, server, make_config):
+    re = ACRCloudRecognizer(make_config(server))
+    results = list(re.recognize_stream(chunked(pcm_seconds(25), 1, 5000), window=10, hop=5))
+    assert [start for start, _ in results] == [0, 5, 10, 15]
+    assert all(status_code(res) == 0 for _, res in results)
+    assert server.requests == 4
+    re.close()
+
+
+# scan strategies, on a recording whose every sample holds the second it belongs to and
+# an identify answered from a playlist of (start, seconds played, acrid, catalogue seconds).
+
+PLAYLIST = [(0, 200, 'a', 200), (205, 150, 'b', 150), (355, 240, 'c', 300), (625, 180, 'd', 180),
+            (805, 220, 'e', 220), (1025, 175, 'f', 230)]
+DURATION = 1200
+
+
+def stamped_decode(file_name, start_time_seconds, audio_len_seconds, *args):
+    samples = array.array('h')
+    for second in range(DURATION):
+        samples.extend(array.array('h', [second]) * 8000)
+    return samples.tobytes()
+
+
+class PlaylistRecognizer(ACRCloudRecognizer):
+    def recognize(self, wav_audio_buffer, user_params=None, parse=False, deadline=None):
+        samples = memoryview(wav_audio_buffer).cast('h')
+        start, end = samples[0], samples[-1] + 1
+        best, overlap = None, 0
+        for track in PLAYLIST:
+            covered = min(end, track[0] + track[1]) - max(start, track[0])
+            if covered > overlap:
+                best, overlap = track, covered
+        if best is None or overlap < 3:
+            res = {'status': {'msg': 'No result', 'code': 1001, 'version': '1.0'}}
+        else:
+            track_start, played, acrid, catalogue = best
+            res = {'status': {'msg': 'Success', 'code': 0, 'version': '1.0'},
+                   'metadata': {'music': [{'acrid': acrid, 'title': acrid,
+                                           'score': 100 if overlap == end - start else 60,
+                                           'duration_ms': catalogue * 1000,
+                                           'play_offset_ms': min(end - track_start, played) * 1000}]}}
+        return self.check_result(ACRCloudJson.get().dumps(res), parse)
+
+
+@pytest.fixture
+def playlist_recognizer(stub, monkeypatch):
+    stub.configure(duration_seconds=DURATION)
+    monkeypatch.setattr(stub, 'decode_audio_by_file', stamped_decode)
+    return PlaylistRecognizer({'access_key': 'test', 'access_secret': 'test'})
+
+
+def scan(re, strategy, **options):
+    summary = ACRCloudScanSummary()
+    results = list(re.scan_file('recording.mp3', 10, 10, parse=True, strategy=strategy, summary=summary,
+                                **options))
+    starts = [start for start, _ in results]
+    assert starts == sorted(starts) and len(set(starts)) == len(starts)
+    tracks = set(res.top_match.acrid for _, res in results if res.is_match)
+    return tracks, summary
+
+
+@pytest.mark.parametrize('strategy,options', [('skip_matched', {}),
+                                              ('coarse_to_fine', {'coarse_step': 60}),
+                                              ('coarse_to_fine', {'coarse_step': 120, 'precision': 2})])
+def test_scan_strategies_find_the_tracks_of_a_fixed_scan(playlist_recognizer, strategy, options):
+    fixed, fixed_summary = scan(playlist_recognizer, 'fixed')
+    assert fixed == set(track[2] for track in PLAYLIST)
+    tracks, summary = scan(playlist_recognizer, strategy, **options)
+    assert tracks == fixed
+    assert summary.identify_calls < fixed_summary.identify_calls
+    assert summary.calls_saved == fixed_summary.identify_calls - summary.identify_calls
+
+
+def test_unknown_scan_strategy(playlist_recognizer):
+    with pytest.raises(ValueError):
+        list(playlist_recognizer.scan_file('recording.mp3', strategy='random'))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import threading
+
+import pytest
+
+from conftest import status_code, pcm_seconds
+from acrcloud.recognizer import ACRCloudRecognizer, ACRCloudConnectionPool, ACRCloudPoolExhausted
+
+
+def test_pool_reuses_keep_alive_connection(http_server):
+    server = http_server()
+    pool = ACRCloudConnectionPool()
+    for _ in range(5):
+        assert pool.request('POST', server.url, b'body') == (200, 'OK', b'ok')
+    assert server.requests == 5
+    assert server.connections == 1
+    pool.close()
+
+
+def test_pool_replaces_connection_closed_while_idle(http_server):
+    server = http_server(close_after_response=True)
+    pool = ACRCloudConnectionPool()
+    for _ in range(3):
+        assert pool.request('POST', server.url, b'body')[0] == 200
+    assert server.requests == 3
+    assert server.connections == 3
+    pool.close()
+
+
+def test_pool_retries_once_when_reused_connection_was_closed(http_server, monkeypatch):
+    # the server closes between the staleness check and the request.
+    monkeypatch.setattr(ACRCloudConnectionPool, '_is_stale', staticmethod(lambda conn: False))
+    server = http_server(close_after_response=True)
+    pool = ACRCloudConnectionPool()
+    for _ in range(3):
+        assert pool.request('POST', server.url, b'body')[0] == 200
+    assert server.requests == 3
+    pool.close()
+
+
+def test_pool_evicts_idle_connections(http_server):
+    server = http_server()
+    pool = ACRCloudConnectionPool(idle_timeout=0)
+    pool.request('POST', server.url, b'body')
+    pool.request('POST', server.url, b'body')
+    assert server.connections == 2
+    pool.close()
+
+
+def test_pool_exhausted_within_timeout(http_server):
+    server = http_server(delay=0.5)
+    pool = ACRCloudConnectionPool(max_per_host=1)
+    busy = threading.Thread(target=pool.request, args=('POST', server.url, b'body'))
+    busy.start()
+    while server.connections == 0:
+        threading.Event().wait(0.01)
+    with pytest.raises(ACRCloudPoolExhausted):
+        pool.request('POST', server.url, b'body', timeout=0.1)
+    busy.join()
+    pool.close()
+
+
+def test_recognizer_sends_every_request_on_one_connection(stub, server, make_config):
+    re = ACRCloudRecognizer(make_config(server))
+    pcm = pcm_seconds(10)
+    for _ in range(4):
+        assert status_code(re.recognize(pcm)) == 0
+    assert server.requests == 4
+    assert server.invalid == 0
+    assert list(re.pool._open.values()) == [1]
+    re.close()
+
+
+def test_pool_exhaustion_is_not_a_host_failure(stub, emulator, make_config):
+    server = emulator(latency=0.5)
+    re = ACRCloudRecognizer(make_config(server, hosts=[server.host], pool_max_per_host=1, timeout=0.3))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(re.recognize(pcm_seconds(10)))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    exhausted = [res for res in results if 'connection pool exhausted' in res]
+    assert len(exhausted) >= 2
+    # only requests that reached the server count against it.
+    assert re.host_router.stats()[server.host]['failures'] == len(results) - len(exhausted)
+    re.close()